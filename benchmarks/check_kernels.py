@@ -0,0 +1,213 @@
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from features.utils.integration import cumulative_integral, integrate, simpson, trapezoid
+from features.utils.join_engine import resample
+from features.utils.preprocessing import (
+    ALS_ITERATIONS, als_baseline, poly_baseline, remove_spikes, savgol, second_difference_bands, solve_pentadiagonal
+)
+from features.utils.rendering import minmax_decimate
+
+# Cada verificacao compara um kernel vetorizado com uma implementacao de referencia direta
+# (np.polyfit, np.linalg.solve, np.interp, lacos por espectro) e devolve o maior erro absoluto
+
+
+def check_savgol(rng):
+    # Centro e bordas contra o ajuste polinomial de cada janela
+    window, order = 11, 3
+    half = window // 2
+    Y = rng.random((200, 5))
+    smoothed = savgol(None, Y, window, order)
+
+    positions = np.arange(window)
+    error = 0.0
+    for column in range(Y.shape[1]):
+        for row in range(Y.shape[0]):
+            start = min(max(row - half, 0), Y.shape[0] - window)
+            fit = np.polyfit(positions, Y[start:start + window, column], order)
+            error = max(error, abs(np.polyval(fit, row - start) - smoothed[row, column]))
+    return error
+
+
+def check_pentadiagonal(rng):
+    n, k, lam = 300, 6, 50.0
+    main, first, second = second_difference_bands(n)
+    weights = rng.random((n, k)) + 0.1
+    b = rng.random((n, k))
+    z = solve_pentadiagonal(lam * main[:, np.newaxis] + weights, lam * first, lam * second, b)
+
+    D = np.diff(np.eye(n), 2, axis=0)
+    penalty = lam * D.T @ D
+    return max(np.abs(np.linalg.solve(penalty + np.diag(weights[:, j]), b[:, j]) - z[:, j]).max()
+               for j in range(k))
+
+
+def check_simpson(rng):
+    # Exato para parabolas em eixos nao uniformes com numero par de intervalos; com numero impar
+    # o ultimo intervalo usa trapezio, exato so para retas
+    error = 0.0
+    for n, degree in ((9, 2), (10, 1)):
+        x = np.sort(rng.random(n)) * 10
+        for _ in range(4):
+            polynomial = np.polynomial.Polynomial(rng.random(degree + 1))
+            exact = polynomial.integ()(x[-1]) - polynomial.integ()(x[0])
+            error = max(error, abs(simpson(x, polynomial(x)[:, np.newaxis])[0] - exact))
+    return error
+
+
+def check_trapezoid(rng):
+    # Produto matriz-vetor e integral acumulada contra a soma direta por espectro
+    x = np.sort(rng.random(50)) * 10
+    Y = rng.random((50, 4)) - 0.5
+    reference = np.array([sum((x[i + 1] - x[i]) * (Y[i + 1, j] + Y[i, j]) / 2 for i in range(x.size - 1))
+                          for j in range(Y.shape[1])])
+    cumulative = cumulative_integral(x, Y, absolute=False)
+    baseline = integrate(x, Y, 'trapezoid', 'linear', absolute=False)
+    linear = cumulative_integral(x, Y, 'linear', absolute=False)[-1]
+    return max(np.abs(trapezoid(x, Y) - reference).max(), np.abs(cumulative[-1] - reference).max(),
+               np.abs(baseline - linear).max())
+
+
+def check_resample(rng):
+    # Interpolacao em lote contra np.interp por espectro; fora do eixo de origem fica NaN
+    x = np.sort(rng.random(80)) * 100
+    Y = rng.random((80, 5))
+    grid = np.linspace(-5, 105, 301)
+    result = resample(x[::-1], Y[::-1], grid)
+
+    inside = (grid >= x[0]) & (grid <= x[-1])
+    if not np.isnan(result[~inside]).all():
+        return np.inf
+    reference = np.column_stack([np.interp(grid[inside], x, Y[:, j]) for j in range(Y.shape[1])])
+
+    single = resample(np.array([50.0]), np.ones((1, 5)), np.array([0.0, 50.0, 100.0]))
+    if not (np.isnan(single[[0, 2]]).all() and np.all(single[1] == 1)):
+        return np.inf
+    return np.abs(result[inside] - reference).max()
+
+
+def check_decimation(rng):
+    # Cada bin mantem o minimo e o maximo do trecho original, na ordem de x
+    x = np.linspace(0, 1, 10007)
+    Y = rng.random((x.size, 4))
+    Y[5000, 2] = 50.0
+    Y[123, 1] = np.nan
+    n_bins = 300
+    xs, ys = minmax_decimate(x, Y, n_bins)
+
+    # Caminho em blocos de colunas (matrizes acima do orcamento): mesmo resultado
+    blocked_xs, blocked_ys = minmax_decimate(x, Y, n_bins, budget=x.size * 8 * 8)
+    if not (np.array_equal(xs, blocked_xs) and np.array_equal(ys, blocked_ys, equal_nan=True)):
+        return np.inf
+
+    factor = int(np.ceil(x.size / n_bins))
+    error = 0.0
+    for j in range(Y.shape[1]):
+        if np.any(np.diff(xs[:, j]) < 0):
+            return np.inf
+        for start in range(0, x.size, factor):
+            block = Y[start:start + factor, j]
+            kept = ys[2 * (start // factor):2 * (start // factor) + 2, j]
+            error = max(error, abs(np.nanmin(block) - kept.min()), abs(np.nanmax(block) - kept.max()))
+    return error
+
+
+def check_als(rng):
+    # Mesmas iteracoes de Eilers com a matriz densa (W + lam D'D) z = W y
+    n, lam, p = 200, 1e4, 0.01
+    x = np.linspace(0, 1, n)
+    Y = (np.exp(-((x - 0.5) / 0.02) ** 2) * 10 + 2 * x)[:, np.newaxis] + rng.normal(0, 0.05, (n, 3))
+    corrected = als_baseline(x, Y, lam, p)
+
+    D = np.diff(np.eye(n), 2, axis=0)
+    penalty = lam * D.T @ D
+    error = 0.0
+    for j in range(Y.shape[1]):
+        weights = np.ones(n)
+        for _ in range(ALS_ITERATIONS):
+            baseline = np.linalg.solve(penalty + np.diag(weights), weights * Y[:, j])
+            weights = np.where(Y[:, j] > baseline, p, 1 - p)
+        error = max(error, np.abs(Y[:, j] - baseline - corrected[:, j]).max())
+    return error
+
+
+def check_spikes(rng):
+    # Os pontos marcados voltam para a mediana local; o resto do espectro nao muda
+    Y = rng.random((300, 4))
+    spiked = Y.copy()
+    spiked[100, 3] += 500
+    spiked[200, 1] += 300
+    cleaned = remove_spikes(None, spiked)
+
+    untouched = np.ones(Y.shape, dtype=bool)
+    untouched[100, 3] = untouched[200, 1] = False
+    return max(np.abs(cleaned[untouched] - Y[untouched]).max(),
+               abs(cleaned[100, 3] - np.median(spiked[98:103, 3])), abs(cleaned[200, 1] - np.median(spiked[198:203, 1])))
+
+
+def check_nan(rng):
+    # Lacunas do join pela uniao dos eixos: cada etapa usa so os pontos finitos e devolve os NaN no lugar
+    x = np.linspace(500, 700, 300)
+    Y = (np.exp(-((x - 600) / 5) ** 2) * 100 + 0.002 * (x - 500) ** 2)[:, np.newaxis] + rng.normal(0, 0.5, (300, 3))
+    padded = Y.copy()
+    padded[:20, 0] = np.nan
+    padded[-5:, 1] = np.nan
+
+    stages = (
+        lambda x, Y: remove_spikes(x, Y),
+        lambda x, Y: savgol(x, Y, 11, 3),
+        lambda x, Y: poly_baseline(x, Y, 3),
+        lambda x, Y: als_baseline(x, Y, 1e5, 0.01),
+    )
+    error = 0.0
+    for stage in stages:
+        result = stage(x, padded)
+        if not np.array_equal(np.isnan(result), np.isnan(padded)):
+            return np.inf
+        error = max(error, np.abs(result[20:, 0] - stage(x[20:], Y[20:, [0]])[:, 0]).max(),
+                    np.abs(result[:-5, 1] - stage(x[:-5], Y[:-5, [1]])[:, 0]).max())
+    return error
+
+
+CHECKS = dict(
+    savgol=(check_savgol, 1e-9),
+    pentadiagonal=(check_pentadiagonal, 1e-9),
+    simpson=(check_simpson, 1e-9),
+    trapezoid=(check_trapezoid, 1e-12),
+    resample=(check_resample, 1e-12),
+    decimation=(check_decimation, 0.0),
+    als=(check_als, 1e-6),
+    spikes=(check_spikes, 0.0),
+    nan=(check_nan, 1e-6),
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Numerical checks of the vectorized kernels against direct references')
+    parser.add_argument('checks', nargs='*', metavar='CHECK', help=f'checks to run (default: all of {", ".join(CHECKS)})')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    unknown = set(args.checks) - set(CHECKS)
+    if unknown:
+        parser.error(f'unknown checks: {", ".join(sorted(unknown))}')
+
+    failed = False
+    for name in args.checks or CHECKS:
+        function, tolerance = CHECKS[name]
+        error = function(np.random.default_rng(args.seed))
+        ok = error <= tolerance
+        failed |= not ok
+        print(f'{name:14s} max error {error:.3g} (tolerance {tolerance:g}) {"ok" if ok else "FAILED"}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+# Cria a janela, processa os eventos pendentes e sai: mede o tempo ate a primeira janela
+FIRST_WINDOW = '''
+import time
+start = time.perf_counter()
+from features.ui import App
+app = App()
+app.update()
+print(time.perf_counter() - start)
+app.destroy()
+'''
+
+
+def import_times(module='features.ui'):
+    # Roda "python -X importtime" em um processo novo e devolve {modulo: (self_us, cumulative_us)}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def first_window_time():
+    result = subprocess.run(
+        [sys.executable, '-c', FIRST_WINDOW],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure(module='features.ui', repeat=5, window=False):
+    # Mediana de varias execucoes para reduzir o ruido do cache de disco
+    totals = []
+    times = {}
+    for _ in range(repeat):
+        times = import_times(module)
+        totals.append(times[module][1] / 1e6)
+    totals.sort()
+
+    heaviest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:15]
+
+    report = dict(
+        module=module,
+        import_seconds=totals[len(totals) // 2],
+        heaviest_modules={name: self_us / 1e6 for name, (self_us, _) in heaviest},
+        loaded=sorted(times),
+    )
+    if window:
+        report['first_window_seconds'] = first_window_time()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Startup time benchmark based on python -X importtime')
+    parser.add_argument('--module', default='features.ui')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--window', action='store_true', help='also time App() creation (needs a display)')
+    parser.add_argument('--output', help='write the report to this JSON file')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='allowed relative slowdown against the baseline (default 20%%)')
+    args = parser.parse_args(argv)
+
+    report = measure(args.module, args.repeat, args.window)
+
+    print(f"import {report['module']}: {report['import_seconds'] * 1000:.1f} ms")
+    if report.get('first_window_seconds') is not None:
+        print(f"first window: {report['first_window_seconds'] * 1000:.1f} ms")
+    for name, seconds in report['heaviest_modules'].items():
+        print(f'  {seconds * 1000:8.1f} ms  {name}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+        failed = False
+        for key in ('import_seconds', 'first_window_seconds'):
+            if baseline.get(key) and report.get(key):
+                ratio = report[key] / baseline[key]
+                print(f'{key}: {ratio:.2f}x baseline')
+                failed |= ratio > 1 + args.max_regression
+
+        for name in ('seaborn', 'pandas', 'plotly', 'pandastable', 'mplcyberpunk'):
+            if name in report['loaded'] and name not in baseline.get('loaded', []):
+                print(f'{name} is now imported at startup')
+                failed = True
+
+        return 1 if failed else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sem display e sem cache em disco: cada medida le os arquivos de verdade
+os.environ.setdefault('MPLBACKEND', 'Agg')
+os.environ['PYMAGPL_CACHE'] = '0'
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import synthetic
+from features.batch import SessionPlotter
+from features.utils.dataset import Dataset
+from features.utils.export import export_dataset
+from features.utils.parallel_import import import_files
+from features.utils.SPE_Loader import read_spe, _HEADER_CACHE
+
+
+def timeit(function, repeat=5, setup=None):
+    # Tempo de parede de cada repeticao; setup roda fora da medida
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return dict(min=min(times), median=statistics.median(times), max=max(times), repeat=repeat)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_spe(folder, n_points, n_spectra, height, repeat):
+    path = synthetic.write_spe(os.path.join(folder, 'bench.spe'), n_points, height, n_spectra)
+
+    def read():
+        read_spe(path).getSpectra().to_numpy()
+
+    # Cabecalho fora do cache: mede a leitura completa
+    return timeit(read, repeat, setup=_HEADER_CACHE.clear)
+
+
+def bench_import(folder, n_points, n_spectra, repeat):
+    paths = synthetic.make_text_session(os.path.join(folder, 'text'), n_spectra, n_points)
+    return timeit(lambda: import_files(paths), repeat)
+
+
+def bench_plots(dataset, repeat):
+    plotter = SessionPlotter(dataset)
+    plotter.LineGraph()
+    plotter.canvas.draw()
+
+    def false_color():
+        plotter.FalseColorPlot()
+        plotter.canvas.draw()
+
+    def integral():
+        # Cache vazio: mede a integracao, nao a consulta ao cache
+        plotter.integration_engine.clear()
+        plotter.CalculateIntegral()
+        plotter.canvas.draw()
+
+    return dict(
+        false_color=timeit(false_color, repeat),
+        integral=timeit(integral, repeat),
+        draw=timeit(plotter.canvas.draw, repeat),
+    )
+
+
+def bench_export(folder, dataset, repeat):
+    results = {}
+    for extension in ('.csv', '.npz'):
+        path = os.path.join(folder, 'export' + extension)
+        results[extension[1:]] = timeit(lambda: export_dataset(dataset, path), repeat)
+    return results
+
+
+def run(n_points=1340, n_spectra=200, height=1, repeat=5):
+    results = {}
+
+    with tempfile.TemporaryDirectory() as folder:
+        results['spe_getSpectra'] = bench_spe(folder, n_points, n_spectra, height, repeat)
+        results['import_join'] = bench_import(folder, n_points, n_spectra, repeat)
+
+        dataset = Dataset(*synthetic.sweep(n_points, n_spectra))
+        for name, result in bench_plots(dataset, repeat).items():
+            results[name] = result
+        for name, result in bench_export(folder, dataset, repeat).items():
+            results[f'export_{name}'] = result
+
+    return dict(
+        commit=git_commit(),
+        python=platform.python_version(),
+        numpy=np.__version__,
+        machine=platform.machine(),
+        params=dict(n_points=n_points, n_spectra=n_spectra, height=height, repeat=repeat),
+        results=results,
+    )
+
+
+def compare(report, baseline, max_regression):
+    # Compara as medianas com outro relatorio (outro commit) e aponta as regressoes
+    failed = False
+    for name, result in report['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        ratio = result['median'] / old['median']
+        flag = ratio > 1 + max_regression
+        failed |= flag
+        print(f"{name:16s} {ratio:6.2f}x {'REGRESSION' if flag else ''}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the import, plotting, integration and export paths')
+    parser.add_argument('--points', type=int, default=1340, help='points per spectrum')
+    parser.add_argument('--spectra', type=int, default=200, help='spectra per sweep (files or SPE frames)')
+    parser.add_argument('--height', type=int, default=1, help='CCD rows of the synthetic SPE frames')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the report to this JSON file')
+    parser.add_argument('--baseline', help='JSON report of another commit to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='allowed relative slowdown against the baseline (default 20%%)')
+    args = parser.parse_args(argv)
+
+    report = run(args.points, args.spectra, args.height, args.repeat)
+
+    for name, result in report['results'].items():
+        print(f"{name:16s} {result['median'] * 1000:10.2f} ms  (min {result['min'] * 1000:.2f} ms)")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        return 1 if compare(report, baseline, args.max_regression) else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import os
+import struct
+import numpy as np
+
+# Tipos de dado do cabecalho SPE 2.x (mesma ordem de TO_NP_TYPE em SPE_Loader)
+SPE_DATATYPES = {np.dtype(np.float32): 0, np.dtype(np.int32): 1, np.dtype(np.int16): 2, np.dtype(np.uint16): 3}
+
+
+def sweep(n_points=1340, n_spectra=200, x_range=(540.0, 700.0), seed=0):
+    # Varredura de campo sintetica: um pico de PL que desloca e muda de intensidade a cada espectro
+    rng = np.random.default_rng(seed)
+    x = np.linspace(*x_range, n_points)
+    field = np.linspace(0, 1, n_spectra)
+
+    center = x_range[0] + (x_range[1] - x_range[0]) * (0.4 + 0.2 * field)
+    width = 0.02 * (x_range[1] - x_range[0])
+    amplitude = 1000 * (1 + np.sin(2 * np.pi * field))
+
+    intensity = amplitude * np.exp(-0.5 * ((x[:, np.newaxis] - center) / width) ** 2)
+    intensity += rng.normal(100, 5, intensity.shape)
+    return x, intensity
+
+
+def write_spe(path, width=1340, height=1, frames=200, dtype=np.uint16, x_range=(540.0, 700.0), seed=0):
+    # Arquivo SPE 2.x com cabecalho de 4100 bytes e frames (height, width)
+    header = bytearray(4100)
+    struct.pack_into('<f', header, 10, 1.0)                 # ExpTime
+    struct.pack_into('<H', header, 42, width)
+    struct.pack_into('<h', header, 108, SPE_DATATYPES[np.dtype(dtype)])
+    struct.pack_into('<H', header, 656, height)
+    struct.pack_into('<i', header, 1446, frames)
+    struct.pack_into('<h', header, 1510, 1)                 # NumROI
+    struct.pack_into('<6H', header, 1512, 0, width - 1, 1, 0, height - 1, 1)
+    struct.pack_into('<f', header, 1992, 2.5)               # SPEVersion
+    struct.pack_into('<d', header, 3183, x_range[0])
+    struct.pack_into('<d', header, 3199, x_range[1])
+    struct.pack_into('<d', header, 3311, 532.0)             # Laser
+
+    _, intensity = sweep(width, frames, x_range, seed)
+    # Cada linha do CCD recebe uma fracao do sinal, como em um binning vertical
+    frame_rows = intensity.T[:, np.newaxis, :] / height * np.ones((1, height, 1))
+
+    with open(path, 'wb') as file:
+        file.write(header)
+        file.write(np.clip(frame_rows, 0, np.iinfo(dtype).max if np.dtype(dtype).kind in 'iu' else None)
+                   .astype(dtype).tobytes())
+    return path
+
+
+def write_text(path, n_points=1340, sep=' ', header=True, seed=0, x_range=(540.0, 700.0)):
+    # Espectro unico em duas colunas (x, contagens), como os arquivos exportados pelos espectrometros
+    x, intensity = sweep(n_points, 1, x_range, seed)
+    np.savetxt(path, np.column_stack([x, intensity[:, 0]]), fmt='%.6f', delimiter=sep,
+               header=f'Wavelength{sep}Counts' if header else '', comments='')
+    return path
+
+
+def make_text_session(folder, count=200, n_points=1340, sep=' ', extension='.txt'):
+    os.makedirs(folder, exist_ok=True)
+    return [
+        write_text(os.path.join(folder, f'spectrum_{index:05d}{extension}'), n_points, sep, seed=index)
+        for index in range(count)
+    ]
+
+
+def make_spe_session(folder, count=1, width=1340, height=1, frames=200):
+    os.makedirs(folder, exist_ok=True)
+    return [
+        write_spe(os.path.join(folder, f'sweep_{index:03d}.spe'), width, height, frames, seed=index)
+        for index in range(count)
+    ]
@@ -0,0 +1,126 @@
+import argparse
+import sys
+from .utils.join_engine import parse_grid
+from .utils.out_of_core import parse_size
+
+
+def parse_range(text):
+    x_min, x_max = text.split(':')
+    return float(x_min), float(x_max)
+
+
+def parse_scan(text):
+    nx, ny = text.lower().split('x')
+    return int(nx), int(ny)
+
+
+def parse_smoothing(text):
+    window, order = text.split(':')
+    return dict(window=int(window), order=int(order))
+
+
+def parse_background(text):
+    # poly[:grau] ou als[:lambda]
+    method, _, parameter = text.lower().partition(':')
+    if method == 'poly':
+        return dict(method='poly', degree=int(parameter or 3))
+    if method == 'als':
+        return dict(method='als', lam=float(parameter or 1e5))
+    raise ValueError(text)
+
+
+def parse_interval(text):
+    init, final, step = text.split(':')
+    return float(init), float(final), float(step)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m features', description='Photoluminescence Data Visualizer')
+    commands = parser.add_subparsers(dest='command')
+
+    commands.add_parser('gui', help='open the graphical interface (default)')
+
+    batch = commands.add_parser('batch', help='process folders of spectra without a display')
+    batch.add_argument('inputs', nargs='+', help='session folders (one session per folder with data files) or files')
+    batch.add_argument('-o', '--output', default='exported', help='output folder for the exported data and PNG files')
+    batch.add_argument('--sep', default='Auto', help="column separator: Auto, 'Tab/space', ',' or ';'")
+    batch.add_argument('--spe-rows', type=parse_range, default=None, metavar='START:STOP',
+                       help='CCD rows of 2-D SPE frames to keep (default: all)')
+    batch.add_argument('--spe-binning', type=int, default=None, metavar='N',
+                       help='sum SPE CCD rows in groups of N (default: full vertical binning)')
+    batch.add_argument('--grid', type=parse_grid, default=None, metavar='auto|START:STOP:STEP',
+                       help='resample all spectra onto a common x axis instead of joining the union of the axes')
+    batch.add_argument('--x-range', type=parse_range, default=(None, None), metavar='MIN:MAX')
+    batch.add_argument('--counts-range', type=parse_range, default=(None, None), metavar='MIN:MAX')
+    batch.add_argument('--tags', type=parse_interval, action='append', dest='intervals', metavar='INIT:FINAL:STEP',
+                       help='custom variable interval, can be repeated')
+    batch.add_argument('--tags-file', default=None, metavar='PATH',
+                       help='custom variable values, one per spectrum (text file, or an SPE file for its frame times)')
+    batch.add_argument('--spe-tags', dest='tag_field', default=None, metavar='FIELD',
+                       help="custom variable from the SPE frame metadata: 'time', 'frame' or a metadata name")
+    batch.add_argument('--despike', type=float, default=None, metavar='THRESHOLD',
+                       help='replace points above THRESHOLD robust deviations from a 5-point median (cosmic rays)')
+    batch.add_argument('--smooth', type=parse_smoothing, default=None, metavar='WINDOW:ORDER',
+                       help='Savitzky-Golay smoothing, e.g. 11:3')
+    batch.add_argument('--background', type=parse_background, default=None, metavar='poly[:DEGREE]|als[:LAMBDA]',
+                       help='subtract a modified-polynomial or asymmetric least-squares baseline')
+    batch.add_argument('--normalize', default=None, choices=['max', 'area', 'vector'],
+                       help='normalize every spectrum after the other preprocessing steps')
+    batch.add_argument('--method', default='trapezoid', choices=['trapezoid', 'simpson'])
+    batch.add_argument('--baseline', default='none', choices=['none', 'linear', 'min'])
+    batch.add_argument('--cumulative', action='store_true',
+                       help='also export the cumulative integral of every spectrum over each window')
+    batch.add_argument('--window', type=parse_range, action='append', dest='windows', default=[], metavar='MIN:MAX',
+                       help='integration window, can be repeated')
+    batch.add_argument('--format', dest='fmt', default='csv', choices=['csv', 'npz', 'hdf5', 'parquet'],
+                       help='file format of the exported spectra')
+    batch.add_argument('--map', type=parse_scan, dest='scan', default=None, metavar='NXxNY',
+                       help='treat each session as a spatial scan of NX x NY points and export integrated/peak images')
+    batch.add_argument('--scan-pattern', dest='pattern', default='raster', choices=['raster', 'serpentine'])
+    batch.add_argument('--no-image', dest='image', action='store_false', help='skip the PNG export')
+    batch.add_argument('--memory-budget', type=parse_size, default=None, metavar='SIZE',
+                       help='memory for the spectra of one session, e.g. 512M or 4G; larger sessions are kept on disk')
+    batch.add_argument('--workers', type=int, default=None, help='number of sessions processed in parallel')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'batch':
+        # Etapas de pre-processamento ativas, aplicadas na ordem de preprocessing.STAGES
+        preprocessing = dict(
+            spikes=None if args.despike is None else dict(threshold=args.despike),
+            smooth=args.smooth,
+            baseline=args.background,
+            normalize=None if args.normalize is None else dict(method=args.normalize),
+        )
+        preprocessing = {stage: options for stage, options in preprocessing.items() if options is not None}
+
+        # Nenhum modulo de Tk/customtkinter e importado neste caminho
+        from .batch import run_batch
+
+        def report(result):
+            if 'failed' in result:
+                print(f"[failed] {result['name']}: {result['failed']}", file=sys.stderr)
+            else:
+                print(f"[done] {result['name']}: {result['spectra']} spectra -> {', '.join(result['outputs'].values())}")
+                for path, error in result['errors'].items():
+                    print(f'  [skipped] {path}: {error}', file=sys.stderr)
+
+        results = run_batch(
+            args.inputs, args.output, workers=args.workers, on_result=report, budget=args.memory_budget,
+            sep=args.sep, x_range=args.x_range, counts_range=args.counts_range, intervals=args.intervals,
+            method=args.method, baseline=args.baseline, windows=args.windows, image=args.image, fmt=args.fmt,
+            rows=args.spe_rows and tuple(map(int, args.spe_rows)), binning=args.spe_binning,
+            scan=args.scan, pattern=args.pattern, tags_file=args.tags_file, tag_field=args.tag_field,
+            grid=args.grid, preprocessing=preprocessing, cumulative=args.cumulative
+        )
+        return 1 if any('failed' in result for result in results.values()) else 0
+
+    from .ui import App
+
+    app = App()
+    app.mainloop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
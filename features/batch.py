@@ -0,0 +1,215 @@
+import os
+import numpy as np
+import matplotlib.gridspec as gridspec
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from .data_visualizer import DataVisualizer
+from .data_processing import DataProcessor
+from .utils import rendering
+from .utils.dataset import Dataset
+from .utils.export import build_metadata, export_dataset
+from .utils.formats import EXTENSIONS
+from .utils.integration import IntegrationEngine, cumulative_view
+from .utils.mapping import SpatialMap
+from .utils.out_of_core import exceeds_budget, import_out_of_core, is_mapped, set_budget
+from .utils.parallel_import import import_files
+from .utils.preprocessing import PreprocessingPipeline
+from .utils.tags import build_tags, load_tags, spe_tags
+
+# Formato de exportacao -> extensao do arquivo de dados
+EXPORT_EXTENSIONS = dict(csv='.csv', npz='.npz', hdf5='.h5', parquet='.parquet')
+
+
+class SessionPlotter(DataVisualizer, DataProcessor):
+
+    # Reaproveita os graficos do App sobre uma figura Agg, sem Tk
+    def __init__(self, dataset, x_range=(None, None), counts_range=(None, None),
+                 method='trapezoid', baseline='none', windows=(), preprocessing=None):
+
+        # dataset ja pre-processado; as etapas so decidem se a integral usa abs
+        self.dataset = dataset
+        self.preprocessing_steps = preprocessing or {}
+        self.x_min, self.x_max = x_range
+        self.y_min, self.y_max = counts_range
+
+        self.integration_engine = IntegrationEngine()
+        self.integration_options = dict(method=method, baseline=baseline)
+        self.integration_windows = list(windows)
+
+        self.fig = Figure(figsize=(10, 6), dpi=100)
+        gs = gridspec.GridSpec(2, 2, height_ratios=[1, 0.75])
+
+        self.ax_line = self.fig.add_subplot(gs[0, 0])
+        self.ax_color = self.fig.add_subplot(gs[0, 1])
+        self.ax_integrated = self.fig.add_subplot(gs[1, :])
+
+        self.ax_line.set_xlabel('Wavedata (arb. u.)')
+        self.ax_line.set_ylabel('CCD Counts (arb. u.)')
+
+        self.ax_color.set_xlabel('Wavedata (arb. u.)')
+        self.ax_color.set_ylabel('Custom variable (arb. u.)')
+
+        self.ax_integrated.set_xlabel('Custom variable (arb. u.)')
+        self.ax_integrated.set_ylabel('Integrated counts (normalized)')
+
+        self.fig.tight_layout(pad=1.1)
+        self.canvas = FigureCanvasAgg(self.fig)
+
+        self.ResetArtists()
+
+    def ReadIntegrationOptions(self):
+        pass
+
+    def RenderDataFrame(self):
+        pass
+
+    def UpdateLineGraph(self):
+        # Sem mainloop: a decimacao do novo intervalo roda direto
+        x_min, x_max = sorted(self.ax_line.get_xlim())
+        self.SetLineSegments(self.ComputeLineSegments(x_min, x_max, rendering.axes_pixel_size(self.ax_line)[0]))
+
+    def Draw(self):
+        self.LineGraph()
+
+        if self.x_min is not None or self.x_max is not None:
+            self.ax_line.set_xlim(self.x_min, self.x_max)
+        if self.y_min is not None or self.y_max is not None:
+            self.ax_line.set_ylim(self.y_min, self.y_max)
+
+        self.FalseColorPlot()
+        self.CalculateIntegral()
+        self.canvas.draw()
+
+
+def find_sessions(inputs, extensions=EXTENSIONS):
+    # Cada pasta com arquivos de dados e uma sessao; arquivos soltos formam uma sessao propria
+    sessions = {}
+
+    for path in inputs:
+        if os.path.isfile(path):
+            name = os.path.splitext(os.path.basename(path))[0]
+            sessions[name] = [os.path.realpath(path)]
+            continue
+
+        for folder, _, files in os.walk(path):
+            files = sorted(file for file in files if os.path.splitext(file)[1].lower() in extensions)
+            if not files:
+                continue
+            name = os.path.relpath(folder, os.path.dirname(os.path.normpath(path))).replace(os.sep, '_')
+            sessions[name] = [os.path.realpath(os.path.join(folder, file)) for file in files]
+
+    return sessions
+
+
+def load_dataset(paths, sep='Auto', intervals=None, rows=None, binning=None, tags_file=None, tag_field=None,
+                 sort=True, grid=None):
+    if exceeds_budget(paths, rows, binning):
+        # Sessao maior que o orcamento de memoria: matriz mapeada do disco
+        x, intensities, errors = import_out_of_core(paths, sep, rows, binning, grid=grid)
+    else:
+        x, intensities, errors = import_files(paths, sep, rows=rows, binning=binning, grid=grid)
+
+    # Variavel customizada: intervalos, arquivo de valores ou metadados dos proprios SPE
+    if tags_file is not None:
+        tags = load_tags(tags_file, tag_field or 'time', rows, binning)
+    elif tag_field is not None:
+        tags = spe_tags([path for path in paths if path not in errors], tag_field, rows, binning)
+    else:
+        tags = build_tags(intervals or [])
+
+    if is_mapped(intensities):
+        dataset = Dataset.from_store(x, intensities)
+    else:
+        dataset = Dataset(x, intensities)
+    dataset.set_tags(tags, sort)
+    return dataset, errors
+
+
+def process_session(name, paths, output_dir, sep='Auto', x_range=(None, None), counts_range=(None, None),
+                    intervals=None, method='trapezoid', baseline='none', windows=(), image=True, fmt='csv',
+                    rows=None, binning=None, scan=None, pattern='raster', tags_file=None, tag_field=None,
+                    grid=None, preprocessing=None, cumulative=False):
+    # import -> tags -> pre-processamento -> crop -> integrate -> export de uma sessao
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Numa varredura espacial a ordem dos espectros e a posicao: nao e reordenada pelas tags
+    dataset, errors = load_dataset(
+        paths, sep, intervals, rows, binning, tags_file, tag_field, sort=scan is None, grid=grid)
+    if dataset.n_spectra == 0:
+        raise ValueError(f'No spectra could be imported for session {name}')
+
+    steps = preprocessing or {}
+    dataset = PreprocessingPipeline().run(dataset, steps)
+
+    view = dataset.view(*x_range)
+    windows = list(windows) or [x_range]
+    integrals = IntegrationEngine().integrate(
+        dataset, windows, method=method, baseline=baseline, absolute='baseline' not in steps)
+
+    outputs = {}
+
+    outputs['data'] = os.path.join(output_dir, name + EXPORT_EXTENSIONS[fmt])
+    export_dataset(view, outputs['data'], fmt, build_metadata(view, paths, x_range, counts_range))
+
+    outputs['integrated'] = os.path.join(output_dir, f'{name}_integrated.csv')
+    header = 'custom_variable ' + ' '.join(
+        f'{"all" if x_min is None else x_min}:{"all" if x_max is None else x_max}' for x_min, x_max in windows)
+    np.savetxt(outputs['integrated'], np.column_stack([dataset.custom_axis(), integrals.T]),
+               header=header, comments='')
+
+    if cumulative:
+        # Integral acumulada de cada janela: curvas (n_x, n_espectros) exportadas como um conjunto de espectros
+        for index, window in enumerate(windows):
+            window_view = dataset.view(*window)
+            curves = Dataset.from_arrays(
+                window_view.x, cumulative_view(window_view, baseline, 'baseline' not in steps),
+                window_view.tags, window_view.order)
+            suffix = '' if len(windows) == 1 else f'_{index + 1}'
+            outputs['cumulative' + suffix] = os.path.join(output_dir, f'{name}_cumulative{suffix}' + EXPORT_EXTENSIONS[fmt])
+            export_dataset(curves, outputs['cumulative' + suffix], fmt, build_metadata(curves, paths, window))
+
+    if scan is not None:
+        # Varredura espacial: uma imagem integrada e uma de posicao do pico por janela
+        smap = SpatialMap(dataset, *scan, pattern)
+        outputs['map'] = os.path.join(output_dir, f'{name}_map.npz')
+        np.savez_compressed(
+            outputs['map'],
+            integrated=np.array([smap.integrated_image(*window, method, baseline, 'baseline' not in steps) for window in windows]),
+            peak=np.array([smap.peak_image(*window) for window in windows]),
+            windows=np.array(windows, dtype=np.float64),
+        )
+
+    if image:
+        plotter = SessionPlotter(dataset, x_range, counts_range, method, baseline, windows, steps)
+        plotter.Draw()
+        outputs['image'] = os.path.join(output_dir, f'{name}.png')
+        plotter.fig.savefig(outputs['image'], dpi=150)
+
+    return dict(name=name, files=len(paths), spectra=dataset.n_spectra, outputs=outputs,
+                errors={path: str(error) for path, error in errors.items()})
+
+
+def run_batch(inputs, output_dir, workers=None, on_result=None, budget=None, **options):
+    # Processa as sessoes em paralelo, uma por processo
+    # budget: orcamento de memoria de cada processo, aplicado na inicializacao (o modulo ja foi importado)
+    sessions = find_sessions(inputs)
+    results = {}
+
+    initializer, initargs = (None, ()) if budget is None else (set_budget, (budget,))
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        futures = {
+            pool.submit(process_session, name, paths, output_dir, **options): name
+            for name, paths in sessions.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                result = dict(name=name, failed=str(error))
+            results[name] = result
+            if on_result is not None:
+                on_result(result)
+
+    return results
@@ -1,29 +1,88 @@
-import pandas as pd
 import os
-from pandastable import Table
+import numpy as np
 from tkinter import filedialog as fd
-from .utils.SPE_Loader import read_spe
+from tkinter import messagebox
+from .utils.parallel_import import import_files
+from .utils.dataset import Dataset
+from .utils.folder_watch import FolderWatcher, WATCH_MS
+from .utils.join_engine import join_spectra, parse_grid, resample
+from .utils.out_of_core import exceeds_budget, import_out_of_core, is_mapped
+from .utils.export import FILETYPES, build_metadata, export_dataset
+from .utils.formats import IMPORT_FILETYPES
+from .utils.profiling import profiled, section
 
 class DataImporter:
     
-    def SPEImport(self, file):
-        spe = read_spe(file)
-        df = spe.getSpectra()
-        df.columns = ['x'] + [f'y{i}' for i in range(1, len(df.columns))]
-        return df
-
-    def ImportFiles(self):
+    @profiled()
+    def ImportFiles(self, on_done=None):
                
-        self.tags = None
+        files = fd.askopenfilenames(
+            title='Open a file',
+            filetypes=IMPORT_FILETYPES + (('All files', '*.*'),)
+        )
+        
+        if not files:
+            return
+        
+        try:
+            grid = parse_grid(self.import_grid.get())
+        except ValueError as error:
+            messagebox.showerror('Invalid x grid', str(error))
+            return
+        
+        self.StopWatch()
+        self.grid = grid
+        self.files = files
         self.x_min = None
         self.x_max = None
         self.y_min = None
         self.y_max = None
         
+        self.ClearPlots()
+        
+        paths = [os.path.realpath(file) for file in self.files]
+        sep = self.import_separator.get()
+        
+        # Calculos pendentes se referem ao dataset anterior
+        self.scheduler.cancel_all()
+        
+        # Os arquivos sao lidos em um pool de workers; o Tk so recebe o progresso e o resultado
+        self.import_button.configure(state='disabled')
+        self.import_progress.set(0)
+        self.import_status.configure(text=f'Importing 0/{len(paths)} files')
+        
+        def work(task):
+            
+            def on_progress(done, total, path, error):
+                task.progress(done, total)
+            
+            with section('import_files', files=len(paths)) as sizes:
+                if exceeds_budget(paths):
+                    # Maior que o orcamento de memoria: a matriz fica em disco, mapeada em memoria
+                    x, intensities, errors = import_out_of_core(paths, sep, on_progress=on_progress, grid=grid)
+                else:
+                    x, intensities, errors = import_files(paths, sep, on_progress=on_progress, grid=grid)
+                sizes['intensity'] = intensities
+            return x, intensities, errors
+        
+        def finish(result):
+            if self.FinishImport(*result) and on_done is not None:
+                on_done()
+        
+        self.scheduler.submit(
+            'import', work,
+            on_done=finish,
+            on_error=self.ImportFailed,
+            on_progress=self.ImportProgress
+        )
+        
+    def ClearPlots(self):
+        
         # Limpa os gráficos, caso um re-import seja feito
         self.ax_line.clear()
         self.ax_color.clear()
         self.ax_integrated.clear()
+        self.ResetArtists()
         
         # Nome dos eixos
         self.ax_line.set_xlabel('Wavedata (arb. u.)')
@@ -35,72 +94,179 @@ class DataImporter:
         self.ax_integrated.set_xlabel('Custom variable (arb. u.)')
         self.ax_integrated.set_ylabel('Integrated counts (normalized)')
         
-        filetypes = (
-            ('Text files', '*.txt'),
-            ('Comma-separated values', '*.csv'),
-            ('Dat files', '*.dat'),
-            ('SPE files', '*.spe'),
-            ('All files', '*.*')
-        )
-
-        self.files = fd.askopenfilenames(
-            title='Open a file',
-            filetypes=filetypes
-        )
+    def ImportProgress(self, done, total):
+        
+        self.import_progress.set(done / total)
+        self.import_status.configure(text=f'Importing {done}/{total} files')
+        
+    def ImportFailed(self, error):
+        
+        self.import_button.configure(state='normal')
+        self.idle_status = 'Import failed'
+        self.import_status.configure(text=self.idle_status)
+        messagebox.showerror('Import failed', str(error))
+    
+    @profiled()
+    def FinishImport(self, x, intensities, errors):
+        
+        self.import_button.configure(state='normal')
+        self.idle_status = f'Imported {len(self.files) - len(errors)}/{len(self.files)} files'
+        self.import_status.configure(text=self.idle_status)
         
-        self.df_full = pd.DataFrame({})
+        if errors:
+            messagebox.showwarning(
+                'Some files could not be imported',
+                '\n'.join(f'{os.path.basename(path)}: {error}' for path, error in errors.items())
+            )
+            
+        if intensities.size == 0:
+            return False
 
-        # Loop para processar os arquivos
-        for i, file in enumerate(self.files):
-            filepath = os.path.realpath(file)
-            extension = os.path.splitext(filepath)[1].lower()
+        if is_mapped(intensities):
+            self.dataset = Dataset.from_store(x, intensities)
+        else:
+            self.dataset = Dataset(x, intensities)
+        
+        # A tabela e preenchida junto com os graficos (FinishPlots), depois do pre-processamento
+        return True
+        
+        
+    def ToggleWatch(self):
+        
+        if getattr(self, 'watcher', None) is not None:
+            self.StopWatch()
+            return
+        
+        folder = fd.askdirectory(title='Watch folder')
+        if folder:
+            self.StartWatch(folder)
             
-            # Lê o arquivo e aplica conversão para números
+    def StartWatch(self, folder):
+        
+        if self.dataset is None:
+            try:
+                self.grid = parse_grid(self.import_grid.get())
+            except ValueError as error:
+                messagebox.showerror('Invalid x grid', str(error))
+                return
+            self.x_min = self.x_max = self.y_min = self.y_max = None
+        
+        # Com dados ja carregados so os arquivos que aparecerem depois entram no dataset
+        self.watcher = FolderWatcher(folder, include_existing=self.dataset is None)
+        self.files = tuple(getattr(self, 'files', ()))
+        self.watch_button.configure(text='Stop watching')
+        self.idle_status = f'Watching {os.path.basename(folder)}'
+        self.import_status.configure(text=self.idle_status)
+        self.watch_job = self.after(WATCH_MS, self.PollWatch)
+        
+    def StopWatch(self):
+        
+        if getattr(self, 'watcher', None) is None:
+            return
+        
+        self.after_cancel(self.watch_job)
+        self.scheduler.cancel('watch')
+        self.watcher = None
+        self.watch_button.configure(text='Watch folder')
+        
+    def PollWatch(self):
+        
+        if self.watcher is None:
+            return
+        
+        # Uma varredura por vez; a leitura dos arquivos novos roda fora do mainloop
+        if not {'watch', 'import'} & set(self.scheduler.tasks):
+            watcher = self.watcher
             sep = self.import_separator.get()
+            grid = getattr(self, 'grid', None)
             
-            if extension.lower() == '.spe':
-                df = self.SPEImport(filepath)
-            else:
-                df = pd.read_csv(
-                    filepath, 
-                    sep=r'\s+' if sep == 'Tab/space' else sep, 
-                    header=None, 
-                    engine='python')
+            def work(task):
+                paths = watcher.poll()
+                task.check()
+                return paths, import_files(paths, sep, grid=grid) if paths else None
             
-            df = df.apply(pd.to_numeric, errors='coerce').dropna()
-
-            df.columns = ['x'] + [f'y{i}' for i in range(1, len(df.columns))]
-
-            if i == 0:
-                # Primeira iteração: inicializa self.df_full
-                self.df_full = df
-            else:
-                # Combina os DataFrames usando merge (full join)
-                self.df_full = pd.merge(
-                    left=self.df_full,
-                    right=df,
-                    on='x',
-                    how='outer'
-                )
-            # Renomeia as colunas apos o merge para evitar colunas com nomes duplicados
-            self.df_full.columns = ['x'] + [i for i in range(1, len(self.df_full.columns))]
-
-        # Elimina as duplicatas da coluna 'x' geradas pelo processo de concatenação lateral
-        self.df_full = self.df_full.T.drop_duplicates().T
+            self.scheduler.submit('watch', work, on_done=self.AppendFiles, on_error=self.WatchFailed)
         
-        self.RenderDataFrame()
+        self.watch_job = self.after(WATCH_MS, self.PollWatch)
         
+    def WatchFailed(self, error):
         
-    def ExportData(self):
-               
-        if self.tags:
-            self.df_full.columns = ['wavedata'] + self.tags
-        else:
-            self.df_full.columns = ['wavedata'] + [f'y{i}' for i in range(1, len(self.df_full.columns))]
+        self.StopWatch()
+        self.ImportFailed(error)
         
-        export_df = self.df_full[(self.df_full['wavedata'] >= self.x_min) & (self.df_full['wavedata'] <= self.x_max)]
-            
-        export_df.to_csv('exported_data.csv', sep = ' ', index=False)
+    @profiled()
+    def AppendFiles(self, result):
+        
+        paths, imported = result
+        if imported is None:
+            return
+        
+        x, intensities, errors = imported
+        self.files = self.files + tuple(path for path in paths if path not in errors)
         
+        if errors:
+            self.import_status.configure(
+                text=f'Skipped {len(errors)} file(s): ' + ', '.join(os.path.basename(path) for path in errors))
+        
+        if intensities.size == 0:
+            return
+        
+        if self.dataset is None:
+            self.dataset = Dataset(x, intensities)
+            self.DrawPlots()
+            return
+        
+        start = self.dataset.n_spectra
+        
+        appended = self.dataset.append(x, intensities)
+        if not appended and getattr(self, 'grid', None) is not None:
+            # Com eixo comum ativo os arquivos novos sao reamostrados no eixo do dataset
+            appended = self.dataset.append(self.dataset.x, resample(x, intensities, self.dataset.x))
+        
+        if not appended:
+            # Eixo x diferente dos arquivos anteriores: uniao dos eixos, como no import completo
+            x, matrix = join_spectra([
+                np.column_stack([self.dataset.x, self.dataset.intensity]),
+                np.column_stack([x, intensities])
+            ])
+            self.dataset = Dataset(x, matrix)
+        
+        if not appended or getattr(self, 'preprocessing_steps', None) or 'plots' in self.scheduler.tasks:
+            # Eixo novo, espectros pre-processados ou graficos ainda sendo calculados: refeitos do zero
+            self.ClearPlots()
+            self.DrawPlots()
+            return
+        
+        # So os artistas afetados pelos novos espectros sao atualizados
+        self.AppendPlots(start)
+        self.RenderDataFrame()
+        
+    @profiled()
+    def ExportData(self):
+
+        if self.dataset is None:
+            return
+
+        path = fd.asksaveasfilename(
+            title='Export data',
+            initialfile='exported_data.csv',
+            defaultextension='.csv',
+            filetypes=FILETYPES
+        )
+
+        if not path:
+            return
+
+        # Recorte como view (dos espectros pre-processados); os blocos de linhas sao escritos direto no arquivo
+        view = self.ProcessedDataset().view(self.x_min, self.x_max)
+        metadata = build_metadata(
+            view, getattr(self, 'files', ()), (self.x_min, self.x_max), (self.y_min, self.y_max))
+
+        try:
+            export_dataset(view, path, metadata=metadata)
+        except (ValueError, ImportError, OSError) as error:
+            messagebox.showerror('Export failed', str(error))
+            return
+
         if self.export_image.get() == 'Yes':
-            self.fig.savefig('exported_image.png', dpi = 150)
\ No newline at end of file
+            self.fig.savefig(os.path.splitext(path)[0] + '.png', dpi = 150)
\ No newline at end of file
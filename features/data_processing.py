@@ -1,4 +1,6 @@
-import numpy as np
+from .utils import rendering
+from .utils.profiling import profiled
+from .utils.tags import build_tags, load_tags
 
 class DataProcessor:
        
@@ -8,27 +10,88 @@ class DataProcessor:
         except ValueError:
             return None
     
-    def UpdateCanvas(self):
+    def ParseWindows(self, text):
         
-        self.ax_color.clear()
-        self.ax_integrated.clear()
+        # Janelas no formato "550:560, 600:620"
+        windows = []
+        for item in text.split(','):
+            limits = item.split(':')
+            if len(limits) != 2:
+                continue
+            x_min, x_max = map(self.validate_entry, limits)
+            if x_min is not None and x_max is not None:
+                windows.append((min(x_min, x_max), max(x_min, x_max)))
+        return windows
+    
+    def ReadIntegrationOptions(self):
         
-        self.FalseColorPlot()
-        self.CalculateIntegral()
+        self.integration_options = dict(
+            method=self.integration_method.get().lower(),
+            baseline=self.integration_baseline.get().lower()
+        )
+        self.integration_windows = self.ParseWindows(self.windows_entry.get())
+    
+    @profiled()
+    def UpdateIntegral(self, *args):
         
-        self.ax_color.set_xlabel('Wavedata (arb. u.)')
-        self.ax_color.set_ylabel('Custom variable (arb. u.)')
+        self.ReadIntegrationOptions()
         
-        self.ax_integrated.set_xlabel('Custom variable (arb. u.)')
-        self.ax_integrated.set_ylabel('Integrated counts (arb. u.)')
+        if getattr(self, 'dataset', None) is None:
+            return
         
-        # Redesenha o grafico
-        self.canvas.draw()
+        self.scheduler.submit(
+            'integral',
+            lambda task: self.ComputeIntegral(),
+            on_done=self.FinishIntegral,
+            on_error=self.TaskFailed
+        )
+
+    @profiled()
+    def FinishIntegral(self, result):
+
+        self.DrawIntegral(*result)
+        self.canvas.draw_idle()
     
+    @profiled()
+    def UpdateCanvas(self):
+        
+        self.ReadIntegrationOptions()
+        
+        # Mapa e integral sao calculados fora do thread do Tk; um novo clique cancela o calculo anterior
+        width, height = rendering.axes_pixel_size(self.ax_color)
+
+        def work(task):
+            task.check()
+            frame = self.ComputeFalseColor(width, height)
+            task.check()
+            return frame, self.ComputeIntegral()
+
+        self.scheduler.cancel('integral')
+        self.scheduler.submit('canvas', work, on_done=self.FinishCanvas, on_error=self.TaskFailed)
+
+    @profiled()
+    def FinishCanvas(self, result):
+
+        frame, integral = result
+
+        # Os artistas existentes sao atualizados no lugar, sem limpar os eixos
+        self.DrawFalseColor(frame)
+        self.DrawIntegral(*integral)
+        
+        # Agenda o redesenho para quando o Tk estiver ocioso
+        self.canvas.draw_idle()
+
+    def TaskFailed(self, error):
+        # O modo batch usa este mixin sem Tk
+        from tkinter import messagebox
+
+        messagebox.showerror('Processing failed', str(error))
+    
+    @profiled()
     def ApplyTags(self):
 
-        # Placeholder for user's tag
-        self.tags = []
+        # Placeholder for user's intervals
+        intervals = []
 
         for i, f, s in zip(self.init_entries, self.final_entries, self.step_entries):
 
@@ -41,27 +104,157 @@ class DataProcessor:
             entries = list(filter(lambda value: value is not None, entries))
 
             if len(entries) == 3:
-                self.tags.extend(np.arange(float(i_val), float(
-                    f_val) + float(s_val), float(s_val)))
+                intervals.append(entries)
         
-        if len(self.tags) == 0:
-            self.tags = None
+        try:
+            tags = build_tags(intervals)
+        except ValueError as error:
+            self.TagsFailed(error)
+            return
+
+        self.SetTags(tags)
+
+    @profiled()
+    def LoadTags(self):
+        from tkinter import filedialog as fd
+
+        # Valores de um arquivo de texto (um por espectro) ou os tempos dos frames de um SPE
+        path = fd.askopenfilename(
+            title='Custom variable values',
+            filetypes=(('Text files', '*.txt *.csv *.dat'), ('SPE frame times', '*.spe'), ('All files', '*.*'))
+        )
+        if not path:
+            return
+
+        try:
+            tags = load_tags(path)
+        except (OSError, ValueError) as error:
+            self.TagsFailed(error)
+            return
+
+        self.SetTags(tags)
+
+    def SetTags(self, tags):
+
+        if getattr(self, 'dataset', None) is None:
+            return
+
+        try:
+            order = self.dataset.set_tags(tags)
+        except ValueError as error:
+            self.TagsFailed(error)
+            return
+
+        if order is not None:
+            # Os espectros mudaram de coluna: os segmentos do grafico de linha seguem a nova ordem
+            self.UpdateLineGraph()
             
         self.UpdateCanvas()
         
         self.RenderDataFrame()
+
+    def TagsFailed(self, error):
+        from tkinter import messagebox
+
+        messagebox.showerror('Invalid custom variable', str(error))
             
+    def ProcessedDataset(self):
+        # Espectros apos o pipeline de pre-processamento (cacheado por etapa); sem etapas e o proprio dataset
+        pipeline = getattr(self, 'preprocessing', None)
+        if pipeline is None:
+            return self.dataset
+        return pipeline.run(self.dataset, getattr(self, 'preprocessing_steps', None))
+
+    def ReadPreprocessingOptions(self):
+
+        # Campos vazios ou "None" desligam a etapa
+        steps = {}
+
+        threshold = self.spike_entry.get().strip()
+        if threshold:
+            value = self.validate_entry(threshold)
+            if value is None or value <= 0:
+                raise ValueError(f'Invalid spike threshold {threshold!r}')
+            steps['spikes'] = dict(threshold=value)
+
+        smoothing = self.smooth_entry.get().strip()
+        if smoothing:
+            try:
+                window, order = map(int, smoothing.split(':'))
+            except ValueError:
+                raise ValueError(f'Invalid smoothing {smoothing!r}, expected window:order') from None
+            if window % 2 == 0 or window <= order:
+                raise ValueError(f'The smoothing window must be odd and larger than the order, got {smoothing}')
+            steps['smooth'] = dict(window=window, order=order)
+
+        background = self.background_method.get()
+        parameter = self.validate_entry(self.background_entry.get())
+        if background == 'Polynomial':
+            steps['baseline'] = dict(method='poly', degree=int(parameter) if parameter is not None else 3)
+        elif background == 'ALS':
+            steps['baseline'] = dict(method='als', lam=parameter if parameter is not None else 1e5)
+
+        normalization = self.normalization.get()
+        if normalization != 'None':
+            steps['normalize'] = dict(method=normalization.lower())
+
+        return steps
+
+    @profiled()
+    def ApplyPreprocessing(self):
+
+        try:
+            steps = self.ReadPreprocessingOptions()
+        except ValueError as error:
+            self.TaskFailed(error)
+            return
+
+        if steps == getattr(self, 'preprocessing_steps', None):
+            return
+        self.preprocessing_steps = steps
+
+        if getattr(self, 'dataset', None) is None:
+            return
+
+        # Etapas anteriores a que mudou vem do cache; os graficos sao refeitos com o novo resultado
+        self.ClearPlots()
+        self.DrawPlots()
+
+    @profiled()
     def Crop(self):
 
-        # Valida as entradas para os limites
-        self.x_min = self.validate_entry(
-            self.min_x_entry.get()) or min(self.df_full.iloc[:, 0])
-        self.x_max = self.validate_entry(
-            self.max_x_entry.get()) or max(self.df_full.iloc[:, 0])
-        self.y_min = self.validate_entry(
-            self.min_y_entry.get()) or self.df_full.iloc[:, 1:].values.min()
-        self.y_max = self.validate_entry(
-            self.max_y_entry.get()) or self.df_full.iloc[:, 1:].values.max()
+        if getattr(self, 'dataset', None) is None:
+            return
+
+        # Valida as entradas para os limites; os limites padrao e a decimacao rodam fora do thread do Tk
+        limits = [self.validate_entry(entry.get()) for entry in
+                  (self.min_x_entry, self.max_x_entry, self.min_y_entry, self.max_y_entry)]
+        width, _ = rendering.axes_pixel_size(self.ax_line)
+
+        def work(task):
+            x_min, x_max, y_min, y_max = limits
+            dataset = self.ProcessedDataset()
+            task.check()
+
+            x_start, x_stop = dataset.x_limits()
+            x_min, x_max = x_min or x_start, x_max or x_stop
+            if not y_min or not y_max:
+                counts_min, counts_max = dataset.intensity_limits()
+                y_min, y_max = y_min or counts_min, y_max or counts_max
+            task.check()
+
+            return (x_min, x_max, y_min, y_max), self.ComputeLineSegments(*sorted((x_min, x_max)), width)
+
+        self.scheduler.cancel('line')
+        self.scheduler.submit('crop', work, on_done=self.FinishCrop, on_error=self.TaskFailed)
+
+    @profiled()
+    def FinishCrop(self, result):
+
+        (self.x_min, self.x_max, self.y_min, self.y_max), segments = result
+
+        # Segmentos ja decimados para o novo intervalo: o xlim_changed nao refaz a decimacao
+        self.SetLineSegments(segments)
 
         # Atualiza os limites do gráfico de linha
         self.ax_line.set_xlim(self.x_min, self.x_max)
@@ -69,4 +262,4 @@ class DataProcessor:
         
         self.UpdateCanvas()
         
-        self.RenderDataFrame()
\ No newline at end of file
+        self.RenderDataFrame()
@@ -0,0 +1,144 @@
+import customtkinter as ctk
+import numpy as np
+
+
+class VirtualTable(ctk.CTkFrame):
+
+    # Tabela com um numero fixo de celulas: rolar so reescreve o texto das celulas visiveis
+    def __init__(self, master, visible_rows=10, visible_cols=11, **kwargs):
+        super().__init__(master, **kwargs)
+
+        self.visible_rows = visible_rows
+        self.visible_cols = visible_cols
+        self.row_offset = 0
+        self.col_offset = 0
+
+        self.x = np.empty(0)
+        self.values = np.empty((0, 0))
+        self.labels = []
+
+        ctk.CTkLabel(
+            self,
+            text="Preview of imported data",
+            font=("Arial", 12),
+            fg_color="transparent",
+            text_color="white"
+        ).grid(row=0, column=0, columnspan=visible_cols, pady=(5, 2), sticky="nsew")
+
+        self.header = []
+        for col_index in range(visible_cols):
+            label = ctk.CTkLabel(
+                self, text='', font=("Arial", 12),
+                fg_color="#565b5e", text_color="white")
+            label.grid(row=1, column=col_index, padx=0, pady=8, sticky="nsew")
+            self.header.append(label)
+
+        self.cells = []
+        for row_index in range(visible_rows):
+            row = []
+            for col_index in range(visible_cols):
+                label = ctk.CTkLabel(self, text='', font=("Arial", 10))
+                label.grid(row=row_index + 2, column=col_index, padx=1, pady=1, sticky="nsew")
+                row.append(label)
+            self.cells.append(row)
+
+        # Ultimo texto escrito em cada celula, para evitar chamadas desnecessarias ao Tk
+        self.texts = {}
+
+        self.row_scrollbar = ctk.CTkScrollbar(self, orientation='vertical', command=self.ScrollRows)
+        self.row_scrollbar.grid(row=1, rowspan=visible_rows + 1, column=visible_cols, sticky='ns')
+
+        self.col_scrollbar = ctk.CTkScrollbar(self, orientation='horizontal', command=self.ScrollCols)
+        self.col_scrollbar.grid(row=visible_rows + 2, column=1, columnspan=visible_cols - 1, sticky='we')
+
+        for col_index in range(visible_cols):
+            self.grid_columnconfigure(col_index, weight=1)
+
+        for widget in [self] + self.header + [cell for row in self.cells for cell in row]:
+            widget.bind('<MouseWheel>', self.OnMouseWheel)
+            widget.bind('<Shift-MouseWheel>', self.OnShiftMouseWheel)
+            widget.bind('<Button-4>', lambda event: self.MoveRows(-1))
+            widget.bind('<Button-5>', lambda event: self.MoveRows(1))
+
+    def SetData(self, x, values, labels):
+        # x: coluna fixa a esquerda; values: (n_linhas, n_colunas); labels: cabecalho de todas as colunas
+        self.x = x
+        self.values = values
+        self.labels = list(labels)
+
+        self.row_offset = min(self.row_offset, self.MaxRowOffset())
+        self.col_offset = min(self.col_offset, self.MaxColOffset())
+
+        self.Refresh()
+
+    def MaxRowOffset(self):
+        return max(self.x.size - self.visible_rows, 0)
+
+    def MaxColOffset(self):
+        return max(self.values.shape[1] - (self.visible_cols - 1), 0)
+
+    def Write(self, label, key, text):
+        if self.texts.get(key) != text:
+            label.configure(text=text)
+            self.texts[key] = text
+
+    def Refresh(self):
+        rows = slice(self.row_offset, self.row_offset + self.visible_rows)
+        cols = slice(self.col_offset, self.col_offset + self.visible_cols - 1)
+
+        # Somente a janela visivel e formatada
+        window_x = self.x[rows]
+        window = self.values[rows, cols]
+        labels = [self.labels[0]] + self.labels[1 + cols.start:1 + cols.stop] if self.labels else []
+
+        for col_index, label in enumerate(self.header):
+            text = str(labels[col_index]) if col_index < len(labels) else ''
+            self.Write(label, ('header', col_index), text)
+
+        for row_index, row in enumerate(self.cells):
+            for col_index, label in enumerate(row):
+                if row_index >= window_x.size:
+                    text = ''
+                elif col_index == 0:
+                    text = f'{window_x[row_index]:.6g}'
+                elif col_index - 1 < window.shape[1]:
+                    text = f'{window[row_index, col_index - 1]:.6g}'
+                else:
+                    text = ''
+                self.Write(label, (row_index, col_index), text)
+
+        self.UpdateScrollbar(self.row_scrollbar, self.row_offset, self.visible_rows, self.x.size)
+        self.UpdateScrollbar(self.col_scrollbar, self.col_offset, self.visible_cols - 1, self.values.shape[1])
+
+    def UpdateScrollbar(self, scrollbar, offset, visible, total):
+        if total <= visible:
+            scrollbar.set(0, 1)
+        else:
+            scrollbar.set(offset / total, (offset + visible) / total)
+
+    def ScrollTo(self, args, offset, visible, total, maximum):
+        # Protocolo dos scrollbars do Tk: ('moveto', fracao) ou ('scroll', n, 'units'|'pages')
+        if args[0] == 'moveto':
+            offset = int(round(float(args[1]) * total))
+        elif args[0] == 'scroll':
+            step = visible if args[2] == 'pages' else 1
+            offset += int(args[1]) * step
+        return min(max(offset, 0), maximum)
+
+    def ScrollRows(self, *args):
+        self.row_offset = self.ScrollTo(args, self.row_offset, self.visible_rows, self.x.size, self.MaxRowOffset())
+        self.Refresh()
+
+    def ScrollCols(self, *args):
+        self.col_offset = self.ScrollTo(
+            args, self.col_offset, self.visible_cols - 1, self.values.shape[1], self.MaxColOffset())
+        self.Refresh()
+
+    def MoveRows(self, units):
+        self.ScrollRows('scroll', units, 'units')
+
+    def OnMouseWheel(self, event):
+        self.MoveRows(-1 if event.delta > 0 else 1)
+
+    def OnShiftMouseWheel(self, event):
+        self.ScrollCols('scroll', -1 if event.delta > 0 else 1, 'units')
@@ -1,72 +1,439 @@
 import numpy as np
-import mplcyberpunk
+from .utils import rendering
+from .utils.dataset import Dataset
+from .utils.integration import integrate_windows
+from .utils.profiling import profiled
+
+# Numero de linhas usadas pelo efeito de brilho do mplcyberpunk
+GLOW_LINES = 10
+
+# Intervalo minimo entre redesenhos do mapa no modo watch (ms): o set_data copia a imagem inteira
+LIVE_MAP_MS = 1000
 
 class DataVisualizer:
     
     def PlotData(self):
         
-        self.ImportFiles()
-                
-        self.LineGraph()
+        # A importacao roda em segundo plano; os graficos sao desenhados quando ela termina
+        self.ImportFiles(on_done=self.DrawPlots)
+        
+    def DrawPlots(self):
+        
+        # Pre-processamento, limites e decimacao rodam fora do thread do Tk; o callback so cria os artistas
+        width, _ = rendering.axes_pixel_size(self.ax_line)
+        self.scheduler.cancel('line')
+        self.scheduler.submit(
+            'plots',
+            lambda task: self.ComputeLineGraph(width),
+            on_done=self.FinishPlots,
+            on_error=self.TaskFailed
+        )
         
-        self.FalseColorPlot()
+    def FinishPlots(self, frame):
+                
+        self.DrawLineGraph(frame)
+        self.canvas.draw_idle()
         
-        self.CalculateIntegral()
+        # O mapa e a integral sao calculados em segundo plano (ver UpdateCanvas)
+        self.UpdateCanvas()
         
-        self.canvas.draw()
+        self.RenderDataFrame()
         
     def LineGraph(self):
+
+        self.DrawLineGraph(self.ComputeLineGraph(rendering.axes_pixel_size(self.ax_line)[0]))
+
+    @profiled()
+    def ComputeLineGraph(self, width):
+
+        # Parte numerica do grafico de linha (sem artistas): limites dos dados e segmentos de todo o eixo x
+        dataset = self.ProcessedDataset()
+        x_limits = dataset.x_limits()
+        return dataset.n_spectra, x_limits, dataset.intensity_limits(), self.ComputeLineSegments(*x_limits, width)
+
+    @profiled()
+    def DrawLineGraph(self, frame):
+        from matplotlib import rcParams
+        from matplotlib.collections import LineCollection
                 
-        xdata = self.df_full.iloc[:, 0]
+        count, (x_start, x_stop), (counts_min, counts_max), segments = frame
+        
+        # Todos os espectros em uma unica LineCollection; a colecao repete as cores do ciclo padrao
+        # sozinha, entao espectros acrescentados nao precisam de uma lista de cores nova
+        self.line_collection = LineCollection([], colors=self.SpectrumColors(), linewidths=rcParams['lines.linewidth'])
+        self.ax_line.add_collection(self.line_collection, autolim=False)
+        
+        self.ax_line.update_datalim([(x_start, counts_min), (x_stop, counts_max)])
+        self.ax_line.autoscale_view()
+        
+        self.SetLineSegments(segments)
+        
+        # Recalcula a decimacao quando o intervalo visivel muda (Crop ou zoom da toolbar)
+        self.line_callback = self.ax_line.callbacks.connect('xlim_changed', self.OnLineZoom)
+        
+    def SpectrumColors(self):
+        from matplotlib import rcParams
+
+        return [style['color'] for style in rcParams['axes.prop_cycle']]
+
+    def LineRows(self, dataset, x_min, x_max):
+
+        # Intervalo visivel, com um ponto extra de cada lado para as linhas chegarem as bordas
+        rows = dataset.xslice(x_min, x_max)
+        return slice(max(rows.start - 1, 0), min(rows.stop + 1, dataset.n_points))
+
+    def OnLineZoom(self, ax):
+        
+        if getattr(self, 'line_collection', None) is None:
+            return
+        
+        # A decimacao so depende das linhas visiveis e da largura em pixels (o Crop ja entrega os segmentos)
+        width, _ = rendering.axes_pixel_size(self.ax_line)
+        rows = self.LineRows(self.dataset, *sorted(ax.get_xlim()))
+        if (rows.start, rows.stop, width) != self.line_key:
+            self.UpdateLineGraph()
+        
+    def UpdateLineGraph(self):
+        
+        if getattr(self, 'line_collection', None) is None:
+            return
         
-        for col in self.df_full.columns[1:]:
-            self.ax_line.plot(xdata, self.df_full[col])
+        x_min, x_max = sorted(self.ax_line.get_xlim())
+        width, _ = rendering.axes_pixel_size(self.ax_line)
+        
+        self.scheduler.submit(
+            'line',
+            lambda task: self.ComputeLineSegments(x_min, x_max, width),
+            on_done=self.FinishLineGraph,
+            on_error=self.TaskFailed
+        )
+        
+    @profiled()
+    def ComputeLineSegments(self, x_min, x_max, width):
+
+        # Decimacao min/max das linhas visiveis, pode rodar fora do thread do Tk
+        dataset = self.ProcessedDataset()
+        rows = self.LineRows(dataset, x_min, x_max)
+        xs, ys = rendering.minmax_decimate(dataset.x[rows], dataset.intensity[rows], width)
+        
+        # Segmentos (n_espectros, n_pontos, 2); os dados completos continuam no Dataset
+        return (rows.start, rows.stop, width), np.stack([xs.T, ys.T], axis=-1)
+
+    def FinishLineGraph(self, segments):
+
+        if len(segments[1]) != self.dataset.n_spectra:
+            # Espectros acrescentados (modo watch) durante o calculo: refaz com o dataset atual
+            self.UpdateLineGraph()
+            return
+
+        self.SetLineSegments(segments)
+        self.canvas.draw_idle()
+
+    def SetLineSegments(self, segments):
+
+        if getattr(self, 'line_collection', None) is None:
+            return
+
+        self.line_key, segments = segments
+        self.line_collection.set_segments(segments)
             
+    def ResetArtists(self):
+        
+        # Chamado quando os eixos sao limpos (re-import): os artistas serao recriados
+        if getattr(self, 'line_callback', None) is not None:
+            self.ax_line.callbacks.disconnect(self.line_callback)
+        self.line_collection = None
+        self.line_callback = None
+        self.line_key = None
+        self.color_image = None
+        self.color_image_mode = None
+        self.color_image_axes = None
+        self.integral_lines = []
+        self.integral_fill = []
+        self.DropLiveMap()
+        self.live_integral = None
                 
+    @profiled()
     def FalseColorPlot(self):
 
-        x = self.df_full.iloc[:, 0].values  # Wavedata
-        y = self.tags or self.df_full.columns[1:].astype(
-            float)  # Magnetic field
-        z = self.df_full.iloc[:, 1:].values.T  # PL intensity
-
-        X, Y = np.meshgrid(x, y)
-        self.ax_color.pcolormesh(
-            X,
-            Y,
-            z,
-            cmap='coolwarm',
-            vmin=self.y_min or np.min(z),
-            vmax=self.y_max or np.max(z)
-        )
+        self.DrawFalseColor(self.ComputeFalseColor(*rendering.axes_pixel_size(self.ax_color)))
+
+    @profiled()
+    def ComputeFalseColor(self, width, height):
+
+        # Parte numerica do mapa (sem artistas), pode rodar fora do thread do Tk
+        # Apenas o intervalo visivel e desenhado
+        view = self.ProcessedDataset().view(self.x_min, self.x_max)
+
+        x = view.x  # Wavedata
+        y = view.custom_axis()  # Magnetic field
+        z = view.intensity.T  # PL intensity
+
+        # Limites calculados em blocos: a matriz pode estar mapeada do disco
+        low, high = (None, None) if self.y_min and self.y_max else view.intensity_limits()
+        vmin = self.y_min or low
+        vmax = self.y_max or high
+
+        # Eixo customizado decrescente: inverte a view para manter o eixo y crescente
+        if y.size > 1 and np.all(np.diff(y) < 0):
+            y = y[::-1]
+            z = z[::-1]
+
+        mode = rendering.render_mode(x, y)
+
+        if getattr(self, 'downsample_map', True):
+            # Nao faz sentido desenhar mais celulas do que pixels na tela
+            if mode == 'mesh':
+                # Eixo customizado fora de ordem: linhas vizinhas nao podem ser agrupadas
+                height = z.shape[0]
+            # Extent dos blocos realmente usados no downsample, calculado com os eixos completos
+            extent = rendering.image_extent(
+                x, y, rendering.block_factor(x.size, width), rendering.block_factor(y.size, height))
+            x, y, z = rendering.downsample(x, y, z, width, height)
+        else:
+            extent = rendering.image_extent(x, y)
+
+        return mode, extent, x, y, z, vmin, vmax
+
+    @profiled()
+    def DrawFalseColor(self, frame):
+        from matplotlib.image import NonUniformImage
+
+        mode, extent, x, y, z, vmin, vmax = frame
+
+        # Recorte ou tags novas: o mapa incremental do modo watch e refeito no proximo append
+        self.DropLiveMap()
 
-        self.ax_color.set_xlim(self.x_min, self.x_max)
+        artist = getattr(self, 'color_image', None)
+        reuse = artist is not None and artist.axes is self.ax_color and self.color_image_mode == mode
+
+        if reuse and mode == 'image':
+            artist.set_data(z)
+            artist.set_extent(extent)
+        elif reuse and mode == 'nonuniform':
+            artist.set_data(x, y, z)
+        elif reuse and mode == 'mesh' and all(
+                np.array_equal(old, new) for old, new in zip(self.color_image_axes, (x, y))):
+            # Mesma geometria: atualiza so os dados do QuadMesh
+            artist.set_array(z)
+        else:
+            if artist is not None and artist.axes is not None:
+                artist.remove()
+
+            if mode == 'image':
+                artist = self.ax_color.imshow(
+                    z, extent=extent, origin='lower', aspect='auto',
+                    interpolation='nearest', cmap='coolwarm')
+            elif mode == 'nonuniform':
+                artist = NonUniformImage(self.ax_color, interpolation='nearest', cmap='coolwarm')
+                artist.set_data(x, y, z)
+                self.ax_color.add_image(artist)
+            else:
+                # pcolormesh aceita os eixos 1-D diretamente, sem meshgrid
+                artist = self.ax_color.pcolormesh(x, y, z, shading='nearest', cmap='coolwarm')
+
+            self.color_image = artist
+            self.color_image_mode = mode
         
+        self.color_image_axes = (x, y)
+        artist.set_clim(vmin, vmax)
+
+        self.ax_color.set_xlim(extent[0], extent[1])
+        self.ax_color.set_ylim(extent[2], extent[3])
+        
+    @profiled()
     def CalculateIntegral(self):
 
-        integrals = []
+        self.DrawIntegral(*self.ComputeIntegral())
 
-        x_min = self.x_min if self.x_min is not None else self.df_full[self.df_full.columns[0]].min(
-        )
-        x_max = self.x_max if self.x_max is not None else self.df_full[self.df_full.columns[0]].max(
-        )
+    @profiled()
+    def ComputeIntegral(self):
 
-        filtered_df = self.df_full[
-            (self.df_full[self.df_full.columns[0]] >= x_min) &
-            (self.df_full[self.df_full.columns[0]] <= x_max)
-        ]
+        # Intervalo selecionado ou janelas espectrais definidas pelo usuario
+        windows = self.integration_windows or [(self.x_min, self.x_max)]
 
-        x = filtered_df[filtered_df.columns[0]].values
-        
-        for col in filtered_df.columns[1:]:
-            y = filtered_df[col].values
-            integral = np.trapz(np.abs(y), x=x)
-            
-            integrals.append(integral)
+        # Todas as colunas sao integradas de uma vez, com cache por (janela, metodo, linha de base)
+        # Sem o abs quando a linha de base ja foi removida: o ruido negativo nao e rebatido
+        dataset = self.ProcessedDataset()
+        steps = getattr(self, 'preprocessing_steps', None) or {}
+        integrals = self.integration_engine.integrate(
+            dataset, windows, absolute='baseline' not in steps, **self.integration_options)
 
-        vertical_axis = self.tags or filtered_df.columns[1:]
-                
-        self.ax_integrated.plot(vertical_axis, integrals/max(integrals), linestyle='dashed', marker = 'o')
+        vertical_axis = dataset.custom_axis()
+        peak = np.nanmax(integrals, axis=1, keepdims=True)
+        normalized = integrals / np.where(peak == 0, 1, peak)
+
+        return windows, vertical_axis, normalized
+
+    @profiled()
+    def DrawIntegral(self, windows, vertical_axis, normalized):
+        # mplcyberpunk importa o pyplot: so e carregado no primeiro grafico
+        import mplcyberpunk
+
+        lines = getattr(self, 'integral_lines', [])
+        count = len(windows)
+        
+        if lines and lines[0].axes is self.ax_integrated and len(lines) == count * (1 + GLOW_LINES):
+            # Linhas principais e linhas de brilho sao atualizadas no lugar
+            for index, curve in enumerate(normalized):
+                glows = lines[count + index * GLOW_LINES:count + (index + 1) * GLOW_LINES]
+                for line in [lines[index]] + glows:
+                    line.set_data(vertical_axis, curve)
+        else:
+            for line in lines:
+                if line.axes is not None:
+                    line.remove()
+            for curve in normalized:
+                self.ax_integrated.plot(vertical_axis, curve, linestyle='dashed', marker = 'o')
+            mplcyberpunk.make_lines_glow(self.ax_integrated, n_glow_lines=GLOW_LINES)
+            self.integral_lines = list(self.ax_integrated.get_lines())
+        
+        legend = self.ax_integrated.get_legend()
+        if legend is not None:
+            legend.remove()
+        if count > 1:
+            for line, (x_min, x_max) in zip(self.integral_lines, windows):
+                line.set_label(f'{x_min:g} - {x_max:g}')
+            self.ax_integrated.legend(handles=self.integral_lines[:count])
         
-        mplcyberpunk.make_lines_glow(self.ax_integrated)
-        mplcyberpunk.add_gradient_fill(self.ax_integrated, alpha_gradientglow=0.5)
\ No newline at end of file
+        # O preenchimento em gradiente depende da forma da curva: so ele e refeito
+        for artist in getattr(self, 'integral_fill', []):
+            if artist.axes is not None:
+                artist.remove()
+        
+        before = set(self.ax_integrated.get_children())
+        mplcyberpunk.add_gradient_fill(self.ax_integrated, alpha_gradientglow=0.5)
+        self.integral_fill = [artist for artist in self.ax_integrated.get_children() if artist not in before]
+        
+        # add_gradient_fill restaura os limites antigos e desliga o autoscale
+        self.ax_integrated.set_autoscale_on(True)
+        self.ax_integrated.relim()
+        self.ax_integrated.autoscale_view()
+
+    @profiled()
+    def AppendPlots(self, start):
+
+        # Modo watch: espectros a partir da coluna `start` acabaram de ser acrescentados ao dataset
+        self.AppendLineGraph(start)
+        self.AppendFalseColor(start)
+        self.AppendIntegral(start)
+        self.canvas.draw_idle()
+
+    @profiled()
+    def AppendLineGraph(self, start):
+        from matplotlib.path import Path
+
+        if getattr(self, 'line_collection', None) is None:
+            return
+
+        new = self.dataset.intensity[:, start:]
+
+        rows = self.LineRows(self.dataset, *sorted(self.ax_line.get_xlim()))
+
+        # Apenas os novos espectros sao decimados; os segmentos existentes sao mantidos
+        width, _ = rendering.axes_pixel_size(self.ax_line)
+        xs, ys = rendering.minmax_decimate(self.dataset.x[rows], new[rows], width)
+
+        # get_paths devolve a lista da propria colecao: set_segments recriaria os Path de todos os espectros
+        self.line_collection.get_paths().extend(Path(segment) for segment in np.stack([xs.T, ys.T], axis=-1))
+        self.line_collection.stale = True
+
+        x_start, x_stop = self.dataset.x_limits()
+        self.ax_line.update_datalim([(x_start, np.nanmin(new)), (x_stop, np.nanmax(new))])
+        self.ax_line.autoscale_view()
+
+    @profiled()
+    def AppendFalseColor(self, start):
+
+        view = self.dataset.view(self.x_min, self.x_max)
+        live = getattr(self, 'live_map', None)
+
+        if live is None or live['count'] != start:
+            # Primeiro append depois de um redesenho: colunas agrupadas pela largura do eixo, linhas sem agrupar
+            width, _ = rendering.axes_pixel_size(self.ax_color)
+            columns = rendering.block_starts(view.n_points, width)
+            x = rendering.reduce_axis(view.x, columns) if columns.size < view.n_points else view.x
+            live = self.live_map = dict(columns=columns, x=x, rows=np.empty((0, columns.size)), count=0, limits=None,
+                                        axis=view.x, factor=rendering.block_factor(view.n_points, width), job=None)
+            start = 0
+
+        new = view.intensity[:, start:].T
+        if live['columns'].size < view.n_points:
+            new = np.fmax.reduceat(new, live['columns'], axis=1)
+
+        # Linhas do mapa em um buffer que dobra de tamanho, como o Dataset
+        count = live['count'] + new.shape[0]
+        if live['rows'].shape[0] < count:
+            rows = np.empty((max(2 * live['rows'].shape[0], count, 16), new.shape[1]))
+            rows[:live['count']] = live['rows'][:live['count']]
+            live['rows'] = rows
+        live['rows'][live['count']:count] = new
+        live['count'] = count
+
+        low, high = np.nanmin(new), np.nanmax(new)
+        if live['limits'] is not None:
+            low, high = min(low, live['limits'][0]), max(high, live['limits'][1])
+        live['limits'] = low, high
+
+        # Os appends so preenchem o buffer; o artista e atualizado no maximo uma vez a cada LIVE_MAP_MS
+        if live['job'] is None:
+            live['job'] = self.after(LIVE_MAP_MS, self.RefreshLiveMap)
+
+    @profiled()
+    def RefreshLiveMap(self):
+
+        live = self.live_map
+        live['job'] = None
+
+        y = self.dataset.view(self.x_min, self.x_max).custom_axis()
+        z = live['rows'][:live['count']]
+        low, high = live['limits']
+        mode = rendering.render_mode(live['x'], y)
+        artist = getattr(self, 'color_image', None)
+
+        if mode == 'mesh' or artist is None or mode != self.color_image_mode:
+            # Eixo customizado fora de ordem ou mudanca de modo: redesenho completo
+            self.FalseColorPlot()
+            return
+
+        extent = rendering.image_extent(live['axis'], y, live['factor'])
+        if mode == 'image':
+            artist.set_data(z)
+            artist.set_extent(extent)
+        else:
+            artist.set_data(live['x'], y, z)
+
+        self.color_image_axes = (live['x'], y)
+        artist.set_clim(self.y_min or low, self.y_max or high)
+
+        self.ax_color.set_xlim(extent[0], extent[1])
+        self.ax_color.set_ylim(extent[2], extent[3])
+        self.canvas.draw_idle()
+
+    def DropLiveMap(self):
+
+        # Descarta o mapa incremental e o redesenho agendado (o after seria chamado com o mapa antigo)
+        live = getattr(self, 'live_map', None)
+        if live is not None and live['job'] is not None:
+            self.after_cancel(live['job'])
+        self.live_map = None
+
+    @profiled()
+    def AppendIntegral(self, start):
+
+        windows = self.integration_windows or [(self.x_min, self.x_max)]
+        key = (tuple(windows), tuple(sorted(self.integration_options.items())))
+        live = getattr(self, 'live_integral', None)
+
+        if live is not None and live[0] == key and live[1].shape[1] == start:
+            # So as colunas novas sao integradas
+            new = Dataset.from_arrays(self.dataset.x, self.dataset.intensity[:, start:])
+            integrals = np.concatenate(
+                [live[1], integrate_windows(new, windows, **self.integration_options)], axis=1)
+        else:
+            integrals = self.integration_engine.integrate(self.dataset, windows, **self.integration_options)
+
+        self.live_integral = (key, integrals)
+
+        peak = np.nanmax(integrals, axis=1, keepdims=True)
+        self.DrawIntegral(windows, self.dataset.custom_axis(), integrals / np.where(peak == 0, 1, peak))
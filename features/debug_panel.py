@@ -0,0 +1,91 @@
+import customtkinter as ctk
+from tkinter import filedialog as fd
+from .utils.profiling import default_profiler
+
+# Intervalo de atualizacao do painel (ms)
+REFRESH_MS = 1000
+
+
+class DebugPanel(ctk.CTkToplevel):
+
+    # Janela opcional (F12) com o resumo das medidas e o dump em formato trace-event
+    def __init__(self, master, profiler=default_profiler, **kwargs):
+        super().__init__(master, **kwargs)
+
+        self.profiler = profiler
+        self.title('Debug - timings')
+        self.geometry('760x420')
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        buttons = ctk.CTkFrame(self, fg_color="transparent")
+        buttons.grid(row=0, column=0, padx=5, pady=5, sticky='we')
+
+        self.enabled = ctk.StringVar(value='on' if profiler.enabled else 'off')
+        ctk.CTkSwitch(
+            buttons, text='Record', variable=self.enabled,
+            onvalue='on', offvalue='off', command=self.Toggle
+        ).grid(row=0, column=0, padx=5)
+
+        self.memory = ctk.StringVar(value='on' if profiler.memory or not profiler.enabled else 'off')
+        ctk.CTkSwitch(
+            buttons, text='Peak memory (slower)', variable=self.memory,
+            onvalue='on', offvalue='off', command=self.Toggle
+        ).grid(row=0, column=1, padx=5)
+
+        ctk.CTkButton(buttons, text='Reset', width=80, command=self.Reset).grid(row=0, column=2, padx=5)
+        ctk.CTkButton(buttons, text='Save trace', width=100, command=self.SaveTrace).grid(row=0, column=3, padx=5)
+
+        self.text = ctk.CTkTextbox(self, font=('Courier', 12), wrap='none')
+        self.text.grid(row=1, column=0, padx=5, pady=5, sticky='nsew')
+
+        self.refresh_job = None
+        self.Refresh()
+
+    def destroy(self):
+        # Fechar a janela cancela a proxima atualizacao agendada
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        super().destroy()
+
+    def Toggle(self):
+        self.profiler.disable()
+        if self.enabled.get() == 'on':
+            self.profiler.enable(memory=self.memory.get() == 'on')
+
+    def Reset(self):
+        self.profiler.reset()
+        self.Refresh(schedule=False)
+
+    def SaveTrace(self):
+        path = fd.asksaveasfilename(
+            parent=self,
+            title='Save trace',
+            initialfile='pymagpl_trace.json',
+            defaultextension='.json',
+            filetypes=(('Trace event JSON', '*.json'),)
+        )
+        if path:
+            self.profiler.dump(path)
+
+    def Refresh(self, schedule=True):
+        if not self.winfo_exists():
+            return
+
+        lines = [f"{'section':34s} {'calls':>6s} {'total ms':>10s} {'mean ms':>9s} {'max ms':>9s} {'peak MB':>8s}  sizes"]
+        for name, total in self.profiler.summary().items():
+            peak = '' if total['peak_memory'] is None else f"{total['peak_memory'] / 2**20:.1f}"
+            sizes = ' '.join(f'{key}={value}' for key, value in total['sizes'].items())
+            lines.append(
+                f"{name[-34:]:34s} {total['calls']:6d} {total['total'] * 1000:10.1f} "
+                f"{total['mean'] * 1000:9.1f} {total['max'] * 1000:9.1f} {peak:>8s}  {sizes}"
+            )
+
+        self.text.configure(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('1.0', '\n'.join(lines))
+        self.text.configure(state='disabled')
+
+        if schedule:
+            self.refresh_job = self.after(REFRESH_MS, self.Refresh)
@@ -1,14 +1,30 @@
 import customtkinter as ctk
-import matplotlib.gridspec as gridspec
-import seaborn as sns
 
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from .data_import import DataImporter
 from .data_visualizer import DataVisualizer
 from .data_processing import DataProcessor
+from .utils.integration import IntegrationEngine
+from .utils.join_engine import GRID_OPTIONS
+from .utils.preprocessing import PreprocessingPipeline
+from .utils.scheduler import TaskScheduler
+from .utils.profiling import profiled
+from .data_table import VirtualTable
+from .debug_panel import DebugPanel
+
+# Estilo seaborn "darkgrid" aplicado pelas folhas de estilo do matplotlib, sem importar o seaborn
+SEABORN_STYLES = ['seaborn-v0_8-darkgrid', 'seaborn-v0_8-deep', 'seaborn-v0_8-notebook']
+
+
+def apply_theme():
+    import matplotlib.style
+
+    try:
+        matplotlib.style.use(SEABORN_STYLES)
+    except OSError:
+        # matplotlib antigo sem as folhas de estilo seaborn-v0_8
+        import seaborn as sns
+        sns.set_theme(style="darkgrid")
 
-sns.set_theme(style="darkgrid")
 
 class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
 
@@ -21,12 +37,70 @@ class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
         self.geometry()
         self.title("Photoluminescence Data Visualizer")
 
+        # Opcoes de integracao (atualizadas pelos widgets em FrameCrop)
+        self.integration_engine = IntegrationEngine()
+        self.integration_options = dict(method='trapezoid', baseline='none')
+        self.integration_windows = []
+        self.dataset = None
+
+        # Pre-processamento dos espectros (atualizado pelos widgets em FrameCrop)
+        self.preprocessing = PreprocessingPipeline()
+        self.preprocessing_steps = {}
+
+        # Importacao e calculos rodam fora do mainloop; so os artistas sao atualizados nele
+        self.idle_status = ''
+        self.scheduler = TaskScheduler(self.after, on_busy=self.ShowBusy)
+        self.protocol('WM_DELETE_WINDOW', self.Close)
+
+        # Painel de medidas de tempo/memoria (opcional)
+        self.debug_panel = None
+        self.bind('<F12>', self.OpenDebugPanel)
+
+        apply_theme()
+
         self.FrameMain()
         self.FrameGraphs()
+        
+        # Estado dos artistas (e do modo watch) definido antes do primeiro desenho
+        self.ResetArtists()
+
         self.FrameCrop()
         self.FrameTags()
         self.FrameDataTable()
     
+    def Close(self):
+        self.StopWatch()
+        self.scheduler.shutdown()
+        self.destroy()
+
+    def OpenDebugPanel(self, event=None):
+        if self.debug_panel is not None and self.debug_panel.winfo_exists():
+            self.debug_panel.focus()
+            return
+
+        self.debug_panel = DebugPanel(self)
+        if not self.debug_panel.profiler.enabled:
+            self.debug_panel.enabled.set('on')
+            self.debug_panel.Toggle()
+
+    def ShowBusy(self, tasks):
+        # Cursor de espera e barra indeterminada enquanto os graficos sao recalculados
+        self.configure(cursor='watch' if tasks else '')
+
+        if 'import' in tasks:
+            # A importacao mostra o proprio progresso (ImportProgress)
+            return
+
+        if tasks:
+            self.import_progress.configure(mode='indeterminate')
+            self.import_progress.start()
+            self.import_status.configure(text='Updating plots...')
+        else:
+            self.import_progress.stop()
+            self.import_progress.configure(mode='determinate')
+            self.import_progress.set(1 if self.dataset is not None else 0)
+            self.import_status.configure(text=self.idle_status)
+
     def ClearFrame(self, frame):
         for widget in frame.winfo_children():
             widget.destroy()
@@ -58,12 +132,13 @@ class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
         import_frame.grid_columnconfigure(0, weight=1)
 
         # Import button
-        ctk.CTkButton(
-            import_frame, text='Import data', command=self.PlotData).grid(
+        self.import_button = ctk.CTkButton(
+            import_frame, text='Import data', command=self.PlotData)
+        self.import_button.grid(
                 row=0, column=0, columnspan = 1, pady=5, padx=5, sticky ='NSWE')
 
         # Set column separator elements
-        self.import_separator = ctk.StringVar(value="Tab/space")
+        self.import_separator = ctk.StringVar(value="Auto")
         ctk.CTkLabel(
             import_frame, text='Column separator', 
             fg_color="transparent"
@@ -71,11 +146,43 @@ class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
             row=1, column=0, columnspan = 1, pady=0, padx=5, sticky = 'w')
 
         ctk.CTkComboBox(
-            import_frame, values=['Tab/space', ',', ';'], 
+            import_frame, values=['Auto', 'Tab/space', ',', ';'], 
             variable=self.import_separator
         ).grid(
             row=2, column=0, columnspan = 1, pady=0, padx=5, sticky = 'we')
 
+        # Eixo x comum: uniao dos eixos, grade automatica ou "inicio:fim:passo" digitado
+        self.import_grid = ctk.StringVar(value=GRID_OPTIONS[0])
+        ctk.CTkLabel(
+            import_frame, text='Common x grid', 
+            fg_color="transparent"
+        ).grid(
+            row=3, column=0, columnspan = 1, pady=0, padx=5, sticky = 'w')
+
+        ctk.CTkComboBox(
+            import_frame, values=list(GRID_OPTIONS), 
+            variable=self.import_grid
+        ).grid(
+            row=4, column=0, columnspan = 1, pady=0, padx=5, sticky = 'we')
+
+        # Progresso da importacao
+        self.import_progress = ctk.CTkProgressBar(import_frame)
+        self.import_progress.set(0)
+        self.import_progress.grid(
+            row=5, column=0, columnspan = 1, pady=(10, 0), padx=5, sticky = 'we')
+
+        self.import_status = ctk.CTkLabel(
+            import_frame, text='', fg_color="transparent")
+        self.import_status.grid(
+            row=6, column=0, columnspan = 1, pady=0, padx=5, sticky = 'w')
+
+        # Acompanha uma pasta durante a varredura, acrescentando os arquivos novos
+        self.watcher = None
+        self.watch_button = ctk.CTkButton(
+            import_frame, text='Watch folder', command=self.ToggleWatch)
+        self.watch_button.grid(
+            row=7, column=0, columnspan = 1, pady=5, padx=5, sticky = 'we')
+
     def MiniFrameExportOptions(self):
 
         export_frame = ctk.CTkFrame(self.main_frame)
@@ -104,6 +211,10 @@ class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
             row=2, column = 0, columnspan=1, pady=0, padx=5, sticky = 'we')
 
     def FrameGraphs(self):
+        # O matplotlib so e carregado quando a janela e montada
+        import matplotlib.gridspec as gridspec
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
         self.plot_frame = ctk.CTkFrame(self)
         self.plot_frame.grid(row=0, column=1, padx=2, pady=2, stick='n')
@@ -134,6 +245,8 @@ class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
         self.fig.tight_layout(pad=1.1)
 
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
+        # draw_idle tambem passa por este atributo: o redesenho real entra nas medidas
+        self.canvas.draw = profiled('canvas.draw')(type(self.canvas).draw).__get__(self.canvas)
         self.canvas.draw()
         self.canvas.get_tk_widget().grid(row=0, column=0, padx=5, pady=5)
 
@@ -191,6 +304,60 @@ class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
             command=self.Crop)
         crop_btn.grid(row=0, rowspan=2, column=6, padx=5, pady=5, sticky ='nswe')
 
+        # Opcoes de integracao
+        ctk.CTkLabel(crop_box, text='Integration', fg_color="transparent").grid(row=2, column=0, pady=(10, 0))
+        ctk.CTkLabel(crop_box, text='Baseline', fg_color="transparent").grid(row=2, column=1, pady=(10, 0))
+        ctk.CTkLabel(crop_box, text='Windows (min:max, ...)', fg_color="transparent").grid(row=2, column=3, columnspan=2, pady=(10, 0))
+
+        self.integration_method = ctk.StringVar(value='Trapezoid')
+        ctk.CTkComboBox(
+            crop_box, values=['Trapezoid', 'Simpson'],
+            variable=self.integration_method, command=self.UpdateIntegral
+        ).grid(row=3, column=0)
+
+        self.integration_baseline = ctk.StringVar(value='None')
+        ctk.CTkComboBox(
+            crop_box, values=['None', 'Linear', 'Min'],
+            variable=self.integration_baseline, command=self.UpdateIntegral
+        ).grid(row=3, column=1)
+
+        self.windows_entry = ctk.CTkEntry(crop_box, placeholder_text="e.g. 550:560, 600:620")
+        self.windows_entry.grid(row=3, column=3, columnspan=2, sticky='we')
+        self.windows_entry.bind('<Return>', self.UpdateIntegral)
+
+        # Pre-processamento: remocao de spikes, suavizacao, linha de base e normalizacao
+        ctk.CTkLabel(crop_box, text='Spike threshold', fg_color="transparent").grid(row=4, column=0, pady=(10, 0))
+        ctk.CTkLabel(crop_box, text='Smoothing', fg_color="transparent").grid(row=4, column=1, pady=(10, 0))
+        ctk.CTkLabel(crop_box, text='Background', fg_color="transparent").grid(row=4, column=3, pady=(10, 0))
+        ctk.CTkLabel(crop_box, text='Normalize', fg_color="transparent").grid(row=4, column=4, pady=(10, 0))
+
+        self.spike_entry = ctk.CTkEntry(crop_box, placeholder_text="Off (e.g. 6)")
+        self.spike_entry.grid(row=5, column=0)
+
+        self.smooth_entry = ctk.CTkEntry(crop_box, placeholder_text="Off (window:order)")
+        self.smooth_entry.grid(row=5, column=1)
+
+        self.background_method = ctk.StringVar(value='None')
+        ctk.CTkComboBox(
+            crop_box, values=['None', 'Polynomial', 'ALS'],
+            variable=self.background_method
+        ).grid(row=5, column=3)
+
+        self.normalization = ctk.StringVar(value='None')
+        ctk.CTkComboBox(
+            crop_box, values=['None', 'Max', 'Area', 'Vector'],
+            variable=self.normalization
+        ).grid(row=5, column=4)
+
+        self.background_entry = ctk.CTkEntry(crop_box, placeholder_text="Degree / lambda")
+        self.background_entry.grid(row=6, column=3, pady=(5, 0))
+
+        ctk.CTkButton(
+            master=crop_box, text="Apply processing",
+            corner_radius=5,
+            command=self.ApplyPreprocessing
+        ).grid(row=4, rowspan=3, column=6, padx=5, pady=(10, 0), sticky ='nswe')
+
 
     def FrameTags(self):
         
@@ -244,8 +411,8 @@ class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
 
         def update_num_tags(new_value):
             self.num_tags = int(new_value)
+            self.tag_frame.destroy()
             self.FrameTags()  # Atualiza o frame com o novo número de tags
-            self.FrameDataTable()
 
         ctk.CTkLabel(
             master=self.tag_frame,
@@ -267,104 +434,40 @@ class App(ctk.CTk, DataImporter, DataVisualizer, DataProcessor):
             master=self.tag_frame, text="Apply tags", command=self.ApplyTags)
         tag_btn.grid(row=self.num_tags + 3, columnspan=3, sticky='we', pady=5)
 
+        # Valores lidos de um arquivo (texto ou tempos dos frames SPE) em vez dos intervalos
+        ctk.CTkButton(
+            master=self.tag_frame, text="Load tags from file", command=self.LoadTags
+        ).grid(row=self.num_tags + 4, columnspan=3, sticky='we', pady=5)
+
         # Atualiza o próximo índice vazio
-        self.next_empty_row = self.num_tags + 4
+        self.next_empty_row = self.num_tags + 5
 
     def FrameDataTable(self):
-        # Criar um frame vazio para renderizar o DataFrame quando os dados forem importados
-        self.table_frame = ctk.CTkFrame(self.tag_frame, fg_color="transparent")
-        self.table_frame.grid(
-            row=self.next_empty_row, 
-            column=0, 
-            columnspan=4, 
-            sticky ='NWE',
-            pady=5
-        )
+        # A tabela e criada uma unica vez; depois disso so o texto das celulas e reescrito
+        if getattr(self, 'data_table', None) is None:
+            self.data_table = VirtualTable(self.main_frame, fg_color="transparent")
+            self.data_table.grid(
+                row=5, 
+                column=0, 
+                columnspan=4, 
+                sticky ='NWE',
+                pady=5
+            )
                 
         try:
             self.RenderDataFrame()
         except:
             pass
 
+    @profiled()
     def RenderDataFrame(self):
-        preview_rows = 5
-        preview_cols = 11
-
-        if self.x_max or self.x_min:
-            df = self.df_full[self.df_full.iloc[:, 0].between(self.x_min, self.x_max)]
-        else:
-            df = self.df_full
-
-        # Obter as primeiras e últimas linhas do DataFrame
-        first_preview = df.iloc[0:preview_rows, 0:preview_cols]
-        last_preview = df.iloc[-preview_rows:, 0:preview_cols]
+        # View do intervalo selecionado; a tabela formata apenas as celulas visiveis
+        view = self.ProcessedDataset().view(self.x_min, self.x_max)
 
         # Configurar os cabeçalhos
-        if self.tags:
-            columns = ['Wavedata'] + list(self.tags)[0:preview_cols-1]
+        if view.tags is not None:
+            columns = ['Wavedata'] + list(view.tags)
         else:
-            columns = self.df_full.columns[:preview_cols]
-
-        first_preview.columns = columns
-        last_preview.columns = columns
-
-        # Limpar frame antes de renderizar nova tabela
-        self.ClearFrame(self.table_frame)
+            columns = ['x'] + list(range(1, view.n_spectra + 1))
 
-        # Adicionar título acima da tabela
-        title_label = ctk.CTkLabel(
-            self.table_frame,
-            text="Preview of imported data",
-            font=("Arial", 12),
-            fg_color="transparent",  # Fundo transparente
-            text_color="white"       # Cor do texto
-        )
-        title_label.grid(row=0, column=0, columnspan=preview_cols, pady=(5, 2), sticky ="nsew")
-
-        # Renderizar cabeçalhos com cor de fundo diferente
-        for col_index, col_name in enumerate(columns):
-            label = ctk.CTkLabel(
-                self.table_frame, 
-                text=col_name, 
-                font=("Arial", 12), 
-                fg_color="#565b5e",  # Cor de fundo do cabeçalho
-                text_color="white",  # Cor do texto            
-            )
-            label.grid(row=1, column=col_index, padx=0, pady=8, sticky ="nsew")
-
-        # Renderizar as primeiras linhas
-        current_row = 2
-        for row_index, row in enumerate(first_preview.values):
-            for col_index, cell_value in enumerate(row):
-                label = ctk.CTkLabel(
-                    self.table_frame, 
-                    text=str(cell_value), 
-                    font=("Arial", 10)
-                )
-                label.grid(row=current_row, column=col_index, padx=1, pady=1, sticky ="nsew")
-            current_row += 1
-
-        # Adicionar reticências centralizadas
-        for col_index in range(preview_cols):
-            label = ctk.CTkLabel(
-                self.table_frame, 
-                text="..." if col_index == preview_cols // 2 else "",
-                font=("Arial", 12, "italic")
-            )
-            label.grid(row=current_row, column=col_index, padx=1, pady=1, sticky ="nsew")
-        current_row += 1
-
-        # Renderizar as últimas linhas
-        for row_index, row in enumerate(last_preview.values):
-            for col_index, cell_value in enumerate(row):
-                label = ctk.CTkLabel(
-                    self.table_frame, 
-                    text=str(cell_value), 
-                    font=("Arial", 10)
-                )
-                label.grid(row=current_row, column=col_index, padx=1, pady=1, sticky ="nsew")
-            current_row += 1
-
-        # Ajustar proporção das colunas para preencher espaço dinamicamente
-        for col_index in range(preview_cols):
-            self.table_frame.grid_columnconfigure(col_index, weight=1)
\ No newline at end of file
+        self.data_table.SetData(view.x, view.intensity, columns)
@@ -1,124 +1,338 @@
 import struct
 import numpy as np
-import plotly.graph_objects as go
-import math
 import os
-import pandas as pd
+import re
+import threading
+from collections import OrderedDict
+import xml.etree.ElementTree as ET
+from .mapping import SpatialMap
+
+HEADER_SIZE = 4100
+
+# Campos do cabecalho SPE 2.x: nome -> (tipo, offset em bytes)
+HEADER_FIELDS = {
+    'ExpTime': ('<f4', 10),
+    'LocalDate': ('S16', 20),
+    'frame_width': ('<u2', 42),
+    'CWL': ('<f4', 72),
+    'datatype': ('<i2', 108),
+    'BG': ('<i4', 150),
+    'LocalTime': ('S6', 172),
+    'UTCTime': ('S6', 179),
+    'Grating': ('<f4', 650),
+    'frame_height': ('<u2', 656),
+    'XMLOffset': ('<u8', 678),
+    'num_frames': ('<i4', 1446),
+    'NumROI': ('<i2', 1510),
+    'SPEVersion': ('<f4', 1992),
+    'XStartNM': ('<f8', 3183),
+    'XStopNM': ('<f8', 3199),
+    'Laser': ('<f8', 3311),
+}
+
+HEADER_DTYPE = np.dtype({
+    'names': list(HEADER_FIELDS),
+    'formats': [fmt for fmt, _ in HEADER_FIELDS.values()],
+    'offsets': [offset for _, offset in HEADER_FIELDS.values()],
+    'itemsize': HEADER_SIZE,
+})
+
+# Tipos dos metadados por frame do SPE 3.x (MetaFormat/MetaBlock)
+META_TYPES = {'Int64': '<i8', 'Double': '<f8'}
+
+TO_NP_TYPE = [np.float32, np.int32, np.int16, np.uint16, None, np.float64, np.uint8, None, np.uint32]
+
+# Cabecalhos ja decodificados, indexados por (caminho, tamanho, mtime); LRU limitado, pois o modo
+# watch abre um arquivo novo a cada passo da varredura
+HEADER_CACHE_SIZE = 64
+_HEADER_CACHE = OrderedDict()
+_HEADER_LOCK = threading.Lock()
+
+
+class SPEHeader:
+
+    __slots__ = (
+        'raw', 'Version', 'np_type', 'itemsize', 'Width', 'Height', 'Frame', 'Count',
+        'Laser', 'ExpTime', 'CWL', 'Grating', 'BG', 'LocalDate', 'LocalTime', 'UTCTime',
+        'XMLOffset', 'FrameStride', 'Wavedata', 'WavedataRound', 'NumROI', 'MetaBlock'
+    )
+
+    def __init__(self, header_bytes):
+        self.raw = header_bytes
+        fields = np.frombuffer(header_bytes, dtype=HEADER_DTYPE, count=1)[0]
+
+        self.Version = round(float(fields['SPEVersion']), 1)
+        self.np_type = TO_NP_TYPE[int(fields['datatype'])]
+        self.itemsize = np.dtype(self.np_type).itemsize
+        self.Width = int(fields['frame_width'])
+        self.Height = int(fields['frame_height'])
+        self.Frame = int(fields['num_frames'])
+        self.Count = self.Width * self.Height
+        self.FrameStride = self.Count * self.itemsize
+        self.XMLOffset = int(fields['XMLOffset'])
+        self.NumROI = int(fields['NumROI'])
+        # Campos dos metadados por frame do SPE 3.x: [(tag, atributos)]; a arvore XML nao e mantida
+        self.MetaBlock = None
+
+        self.Laser = float(fields['Laser'])
+        self.ExpTime = float(fields['ExpTime'])
+        self.CWL = float(fields['CWL'])
+        self.Grating = float(fields['Grating'])
+        self.BG = int(fields['BG'])
+        self.LocalDate = fields['LocalDate'].decode("utf-8", "ignore")
+        self.LocalTime = fields['LocalTime'].decode("utf-8", "ignore")
+        self.UTCTime = fields['UTCTime'].decode("utf-8", "ignore")
+
+        # Uma calibracao por coluna do CCD: todas as linhas de um frame compartilham o eixo espectral
+        self.setWavedata(np.linspace(float(fields['XStartNM']), float(fields['XStopNM']), self.Width))
+
+    def setWavedata(self, wavedata):
+        # WavedataRound e mantido por compatibilidade, sem arredondar: arredondar para 2 casas
+        # fazia pixels vizinhos colidirem e desalinhava arquivos com calibracoes proximas
+        self.Wavedata = wavedata
+        self.WavedataRound = wavedata
+
+    def info(self):
+        # Campos do cabecalho em tipos nativos, para os metadados da exportacao
+        return dict(
+            Version=self.Version, Laser=self.Laser, ExpTime=self.ExpTime, CWL=self.CWL,
+            Grating=self.Grating, BG=self.BG, Width=self.Width, Height=self.Height, Frame=self.Frame,
+            LocalDate=self.LocalDate.strip('\x00'), LocalTime=self.LocalTime.strip('\x00'),
+            UTCTime=self.UTCTime.strip('\x00'),
+        )
+
+    def parseXMLFooter(self, footer):
+        # SPE 3.x: calibracao, exposicao e geometria ficam no rodape XML
+        # Remove os namespaces para buscar as tags pelo nome local
+        footer = re.sub(rb'\sxmlns(:\w+)?="[^"]*"', b'', footer)
+        xml = ET.fromstring(footer)
+
+        block = xml.find('.//DataFormat/DataBlock')
+        if block is not None and block.get('stride'):
+            self.FrameStride = int(block.get('stride'))
+
+        exposure = xml.find('.//ShutterTiming/ExposureTime')
+        if exposure is not None and exposure.text:
+            # LightField grava o tempo de exposicao em ms
+            self.ExpTime = float(exposure.text) / 1000
+
+        for element in xml.iter():
+            laser = element.get('laserWavelength')
+            if laser:
+                self.Laser = float(laser)
+                break
+
+        meta = xml.find('.//MetaFormat/MetaBlock')
+        if meta is not None:
+            self.MetaBlock = [(element.tag, dict(element.attrib)) for element in meta]
+
+        calibration = self.sensorCalibration(xml)
+        if calibration is not None:
+            self.setWavedata(calibration)
+        elif self.Version >= 3:
+            # Sem calibracao utilizavel: o cabecalho 2.x do SPE 3.x vem zerado, o eixo vira o indice do pixel
+            self.setWavedata(np.arange(self.Width, dtype=np.float64))
+
+    def sensorCalibration(self, xml):
+        # A calibracao cobre o sensor inteiro; a regiao lida comeca na coluna x do SensorMapping
+        # e cada pixel do frame soma xBinning colunas (o comprimento de onda e a media delas)
+        wavelength = xml.find('.//Calibrations/WavelengthMapping/Wavelength')
+        if wavelength is None or not wavelength.text:
+            return None
+        calibration = np.array(wavelength.text.split(','), dtype=np.float64)
+
+        mapping = xml.find('.//Calibrations/SensorMapping')
+        offset = int(mapping.get('x', 0)) if mapping is not None else 0
+        binning = max(int(mapping.get('xBinning', 1)), 1) if mapping is not None else 1
+
+        stop = offset + self.Width * binning
+        if calibration.size < stop:
+            return None
+        return calibration[offset:stop].reshape(self.Width, binning).mean(axis=1)
+
+
+def load_header(filename):
+    stat = os.stat(filename)
+    key = (os.path.realpath(filename), stat.st_size, stat.st_mtime_ns)
+
+    with _HEADER_LOCK:
+        header = _HEADER_CACHE.get(key)
+        if header is not None:
+            _HEADER_CACHE.move_to_end(key)
+            return header
+
+    with open(filename, "rb") as file:
+        header = SPEHeader(file.read(HEADER_SIZE))
+        if header.Version >= 3 and header.XMLOffset:
+            file.seek(header.XMLOffset)
+            header.parseXMLFooter(file.read())
+
+    with _HEADER_LOCK:
+        _HEADER_CACHE[key] = header
+        while len(_HEADER_CACHE) > HEADER_CACHE_SIZE:
+            _HEADER_CACHE.popitem(last=False)
+
+    return header
+
 
 class read_spe:
-    
+
     def __init__(self, filename):
         self._filename = filename
-        
-    
+        self._header = None
+        self._frames = None
+
+    def getHeader(self):
+        # So o cabecalho de 4100 bytes (e o rodape XML do SPE 3.x) e lido; o bloco de dados e acessado por getFrames
+        if self._header is None:
+            self._header = load_header(self._filename)
+        return self._header
+
     def get_from_bytes(self, byte_data, format, offset):
         calcsize = struct.calcsize(format)
         return struct.unpack(format, byte_data[offset:offset+calcsize])[0]
 
 
     def getDataInformation(self):
-        file = open(self._filename, "rb")
-        bytes = file.read()
-
-        SPEVersion = round(self.get_from_bytes(bytes, "f", 1992), 1)
-
-        datatype = self.get_from_bytes(bytes, "h", 108)
-        frame_width = self.get_from_bytes(bytes, "H", 42)
-        frame_height = self.get_from_bytes(bytes, "H", 656)
-        num_frames = self.get_from_bytes(bytes, "i", 1446)
-        to_np_type = [np.float32, np.int32, np.int16, np.uint16, None, np.float64, np.uint8, None, np.uint32]
-        np_type = to_np_type[datatype]
-        itemsize = np.dtype(np_type).itemsize
-        XMLOffset = self.get_from_bytes(bytes, "64Q", 678)
-
-        Count = frame_width * frame_height
-
-        if SPEVersion < 3:
-            
-            Version = SPEVersion
-            Frame = num_frames
-            Width = frame_width
-            Height = frame_height
-            Laser = self.get_from_bytes(bytes, "d", 3311)
-            LocalDate = self.get_from_bytes(bytes, "16s", 20)
-            LocalDate = LocalDate.decode("utf-8", "ignore")
-           
-            LocalTime = self.get_from_bytes(bytes, "6s", 172)
-            LocalTime = LocalTime.decode("utf-8", "ignore")
-            Time = LocalTime[:2] + ":" + LocalTime[2:4] + ":" + LocalTime[4:]
-            UTCTime = self.get_from_bytes(bytes, "6s", 179)
-            UTCTime = UTCTime.decode("utf-8", "ignore")
-            ExpTime = self.get_from_bytes(bytes, "f", 10)
-            CWL = self.get_from_bytes(bytes, "f", 72)
-            Grating = self.get_from_bytes(bytes, "32f", 650)
-            BG = self.get_from_bytes(bytes, "i", 150)
-            XStartNM = self.get_from_bytes(bytes, "d", 3183)
-            XStopNM = self.get_from_bytes(bytes, "d", 3199)
-
-            PXSize = (XStopNM-XStartNM)/(Count-1)
-            Wavedata = []
-            WavedataRound = []
-            j = 0
-            while j < Count:
-                val = XStartNM + (j * PXSize)
-                Wavedata.append(val)
-                WavedataRound.append(round(val, 2))
-                j += 1
+
+        header = self.getHeader()
 
         self.SPE_Infos = f'''
 Loaded file: {self._filename.split('//')[-1].split('.SPE')[0]}
-SPE Version: {Version}
-Laser wavelength: {Laser}
-Exposure time (s): {ExpTime}
-Grating: {Grating} l/mm
-Background correction: {False if BG == 0 else True}
+SPE Version: {header.Version}
+Laser wavelength: {header.Laser}
+Exposure time (s): {header.ExpTime}
+Grating: {header.Grating} l/mm
+Background correction: {False if header.BG == 0 else True}
 '''
-        return np_type, itemsize, Count, Version, Frame, Width, Height, Laser, ExpTime, CWL, Grating, BG, Wavedata, WavedataRound
+        return (header.np_type, header.itemsize, header.Count, header.Version, header.Frame, header.Width, header.Height,
+                header.Laser, header.ExpTime, header.CWL, header.Grating, header.BG, header.Wavedata, header.WavedataRound)
 
-    def getSpectra(self):
+    def getFrames(self):
+        # View (frames, count) do bloco de dados, sem copia; as paginas so sao lidas quando acessadas
+        if self._frames is None:
+            header = self.getHeader()
+            if header.FrameStride == header.Count * header.itemsize:
+                self._frames = np.memmap(
+                    self._filename,
+                    dtype=header.np_type,
+                    mode='r',
+                    offset=HEADER_SIZE,
+                    shape=(header.Frame, header.Count)
+                )
+            else:
+                # Os frames do SPE 3.x podem ter metadados depois dos pixels
+                buffer = np.memmap(
+                    self._filename,
+                    dtype=np.uint8,
+                    mode='r',
+                    offset=HEADER_SIZE,
+                    shape=(header.Frame * header.FrameStride,)
+                )
+                self._frames = np.ndarray(
+                    shape=(header.Frame, header.Count),
+                    dtype=header.np_type,
+                    buffer=buffer,
+                    strides=(header.FrameStride, header.itemsize)
+                )
+        return self._frames
 
-        np_type, itemsize, Count, Version, Frame, Width, Height, Laser, ExpTime, CWL, Grating, BG, Wavedata, WavedataRound = self.getDataInformation()
+    def getFrame(self, index):
+        return self.getFrames()[index]
 
-        Frame = int(Frame)
-        Itemsize = int(itemsize)
-        Count = int(Count)
+    def getImages(self):
+        # Mesma memoria de getFrames vista como (frames, linhas, colunas) do CCD
+        header = self.getHeader()
+        return self.getFrames().reshape(header.Frame, header.Height, header.Width)
 
-        spectra = []
-        spectra.append(WavedataRound)
+    def getROIs(self):
+        # Tabela de ROIs do cabecalho SPE 2.x: (startx, endx, groupx, starty, endy, groupy) por regiao
+        header = self.getHeader()
+        num_rois = max(header.NumROI, 1)
+        rois = np.frombuffer(header.raw, dtype=np.uint16, count=6 * num_rois, offset=1512)
+        return rois.reshape(num_rois, 6)
 
-        with open(self._filename, 'rb') as file:
-            bytes = file.read()
+    def getFrameMetadata(self):
+        # SPE 3.x: valores gravados depois dos pixels de cada frame (timestamps, numero do frame, gate)
+        # nome -> array (Frame,); timestamps em segundos. SPE 2.x nao tem metadados por frame
+        header = self.getHeader()
+        if header.MetaBlock is None:
+            return {}
 
-            Px = int(math.sqrt(int(Frame)))
-            for i in range(0, Frame):
-                offset = 4100 + i*Count*Itemsize
-                data = np.frombuffer(bytes, dtype=np_type, count=Count, offset=offset)
+        buffer = np.memmap(self._filename, dtype=np.uint8, mode='r', offset=HEADER_SIZE,
+                           shape=(header.Frame * header.FrameStride,))
 
-                spectra.append(data)
+        metadata = {}
+        offset = header.Count * header.itemsize
+        for tag, attributes in header.MetaBlock:
+            dtype = np.dtype(META_TYPES.get(attributes.get('type'), '<i8'))
+            if offset + dtype.itemsize > header.FrameStride:
+                break
 
-        self.spectra_df = pd.DataFrame(spectra).transpose()
-        self.spectra_df.columns = ['wavedata'] + [f'spec_{i}' for i in range(1, len(self.spectra_df.columns), 1)]
-        
-        self._start = min(self.spectra_df['wavedata'])
-        self._final = max(self.spectra_df['wavedata'])
-        
-        self._start_reset = round(min(self.spectra_df['wavedata']), 2)
-        self._final_reset = round(max(self.spectra_df['wavedata']), 2)
-        self.spectra_df_reset = self.spectra_df.copy()
-        
-        return self.spectra_df
-       
+            values = np.ndarray(shape=(header.Frame,), dtype=dtype, buffer=buffer,
+                                offset=offset, strides=(header.FrameStride,)).astype(np.float64)
+            offset += dtype.itemsize
+
+            if tag == 'TimeStamp':
+                name = attributes.get('event', 'TimeStamp')
+                values = values / float(attributes.get('resolution', 1))
+            else:
+                name = tag + attributes.get('component', '')
+            metadata[name] = values
+
+        return metadata
 
-    def getMappingCoordinates(self):
+    def getBinned(self, rows=None, binning=None, frames=None):
+        # Espectros (n_espectros, largura) somando grupos de `binning` linhas dentro de `rows`
+        # rows: (inicio, fim) ou slice das linhas do CCD; binning=None soma todas (binning vertical completo)
+        # frames: slice opcional dos frames lidos (leitura em blocos)
+        images = self.getImages() if frames is None else self.getImages()[frames]
+        height = images.shape[1]
+
+        if rows is not None and not isinstance(rows, slice):
+            rows = slice(*rows)
+        start, stop, _ = (rows or slice(None)).indices(height)
+        count = max(stop - start, 0)
+
+        binning = count if binning is None else int(binning)
+        if binning < 1 or binning > count:
+            raise ValueError(f'Cannot bin {count} CCD rows in groups of {binning}')
+
+        if count == 1 or binning == 1:
+            # Sem soma: view do memmap, nada e lido ainda
+            selected = images[:, start:stop]
+            return selected.reshape(-1, images.shape[2])
+
+        # Linhas que nao completam um grupo sao descartadas, como no binning por hardware
+        groups = count // binning
+        selected = images[:, start:start + groups * binning]
+        blocks = selected.reshape(images.shape[0], groups, binning, images.shape[2])
+
+        # A soma percorre o memmap em blocos; so os espectros binados sao materializados
+        return blocks.sum(axis=2, dtype=np.float64).reshape(-1, images.shape[2])
+
+    def getSpectra(self, rows=None, binning=None):
+        import pandas as pd
+
+        *_, Wavedata, WavedataRound = self.getDataInformation()
+
+        spectra = self.getBinned(rows, binning)
+
+        # A matriz transposta vai direto para o pandas: espectros sem binning nao sao copiados para a RAM
+        self.spectra_df = pd.DataFrame(
+            spectra.T,
+            columns=[f'spec_{i}' for i in range(1, spectra.shape[0] + 1)],
+            copy=False
+        )
+        self.spectra_df.insert(0, 'wavedata', WavedataRound)
+
+        self._start = WavedataRound.min()
+        self._final = WavedataRound.max()
+
+        return self.spectra_df
 
-        num_scanned_lines = int(np.sqrt(len(self.spectra_df.columns) - 1)) # The 1 subtraction is to throw away the Energy/Wavelength column
-        
-        self.x_line = [i for i in range(num_scanned_lines)]
-        self.y_line = self.x_line
-        
-        pixel_coordinates = []
-        for x in self.x_line:
-            for y in self.y_line:
-                pixel_coordinates.append(f'x={x} y={y}')
 
-        self.spectra_df.columns = ['wavedata'] + pixel_coordinates
\ No newline at end of file
+    def getMap(self, nx=None, ny=None, pattern='raster', rows=None, binning=None):
+        # Um espectro (binado) por ponto da varredura: imagens e espectros por indice (iy, ix)
+        spectra = self.getBinned(rows, binning)
+        return SpatialMap.from_arrays(self.getHeader().Wavedata, spectra.T, nx, ny, pattern)
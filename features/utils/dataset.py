@@ -0,0 +1,179 @@
+import numpy as np
+from .out_of_core import copy_to_store, is_mapped, nanlimits, permute_columns
+from .tags import check_tags, sort_order
+
+
+class Dataset:
+
+    # x: eixo espectral ordenado (n_x,)
+    # intensity: matriz contigua (n_x, n_spectra), uma coluna por arquivo/espectro
+    # tags: variavel customizada por espectro (campo, angulo, tempo...) ou None
+    # buffer: matriz pre-alocada com colunas livres para append (modo watch); intensity e uma view dela
+    # order: indice de importacao de cada coluna depois de ordenar pelas tags, ou None (ordem de importacao)
+    __slots__ = ('x', 'intensity', 'tags', 'buffer', 'order')
+
+    def __init__(self, x, intensity, tags=None, dtype=np.float64):
+        x = np.asarray(x, dtype=np.float64)
+        intensity = np.asarray(intensity, dtype=dtype)
+
+        if intensity.ndim == 1:
+            intensity = intensity[:, np.newaxis]
+        if intensity.shape[0] != x.size:
+            raise ValueError(f'x has {x.size} points but the intensity matrix has {intensity.shape[0]} rows')
+
+        if np.any(np.diff(x) < 0):
+            order = np.argsort(x, kind='stable')
+            x = x[order]
+            intensity = intensity[order]
+
+        self.x = x
+        self.intensity = np.ascontiguousarray(intensity)
+        self.tags = None if tags is None else np.asarray(tags, dtype=np.float64)
+        self.buffer = None
+        self.order = None
+
+    @classmethod
+    def from_arrays(cls, x, intensity, tags=None, order=None):
+        # Construtor sem validacao nem copia, usado para as views
+        dataset = cls.__new__(cls)
+        dataset.x = x
+        dataset.intensity = intensity
+        dataset.tags = tags
+        dataset.buffer = None
+        dataset.order = order
+        return dataset
+
+    @classmethod
+    def from_store(cls, x, intensity, tags=None):
+        # Matriz mapeada do disco (ou frames no tipo do arquivo): sem conversao de tipo nem copia contigua, so views
+        x = np.asarray(x, dtype=np.float64)
+        if x.size > 1 and x[0] > x[-1]:
+            x, intensity = x[::-1], intensity[::-1]
+        return cls.from_arrays(x, intensity, None if tags is None else np.asarray(tags, dtype=np.float64))
+
+    @property
+    def out_of_core(self):
+        return is_mapped(self.intensity)
+
+    @property
+    def n_points(self):
+        return self.x.size
+
+    @property
+    def n_spectra(self):
+        return self.intensity.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.x.nbytes + self.intensity.nbytes
+
+    def append(self, x, spectra, tags=None):
+        # Acrescenta espectros (n_x, k) como novas colunas em tempo amortizado O(1) por coluna
+        # Retorna False (sem alterar nada) se o eixo x dos novos espectros for diferente
+        x = np.asarray(x, dtype=np.float64)
+        # Matriz mapeada: o armazenamento novo e float64 (o store SPE pode ser uint16 e truncaria os valores)
+        dtype = np.float64 if self.out_of_core else self.intensity.dtype
+        spectra = np.asarray(spectra, dtype=dtype)
+        if spectra.ndim == 1:
+            spectra = spectra[:, np.newaxis]
+
+        if x.shape != self.x.shape:
+            return False
+        if not np.array_equal(x, self.x):
+            if not np.array_equal(x[::-1], self.x):
+                return False
+            x, spectra = x[::-1], spectra[::-1]
+
+        count, added = self.n_spectra, spectra.shape[1]
+
+        if self.buffer is None or self.buffer.shape[1] < count + added:
+            # Capacidade dobra a cada realocacao: cada coluna e copiada O(1) vezes em media
+            capacity = max(2 * count, count + added, 16)
+            if self.out_of_core:
+                # Cresce em disco, copiando em blocos dentro do orcamento de memoria
+                self.buffer = copy_to_store(self.intensity, capacity)
+            else:
+                buffer = np.empty((self.n_points, capacity), dtype=dtype)
+                buffer[:, :count] = self.intensity
+                self.buffer = buffer
+
+        self.buffer[:, count:count + added] = spectra
+        self.intensity = self.buffer[:, :count + added]
+
+        if self.tags is not None:
+            if tags is None:
+                # Continua a sequencia com o ultimo passo
+                step = self.tags[-1] - self.tags[-2] if self.tags.size > 1 else 1.0
+                tags = self.tags[-1] + step * np.arange(1, added + 1)
+            self.tags = np.concatenate([self.tags, np.asarray(tags, dtype=np.float64)])
+
+        if self.order is not None:
+            # Espectros novos entram depois dos ja ordenados, com o seu indice de importacao
+            self.order = np.concatenate([self.order, np.arange(count, count + added)])
+
+        return True
+
+    def import_order(self):
+        # Indice de importacao de cada coluna atual
+        if self.order is not None:
+            return self.order
+        return np.arange(self.n_spectra)
+
+    def set_tags(self, tags, sort=True):
+        # tags: um valor por espectro na ordem de importacao, mesmo que as colunas ja tenham sido ordenadas
+        # Com sort=True uma varredura fora de ordem e ordenada; devolve a permutacao aplicada ou None
+        tags = None if tags is None else check_tags(tags, self.n_spectra)
+        target = sort_order(tags) if sort else None
+
+        # Desfaz a ordenacao anterior e aplica a nova em uma unica permutacao das colunas
+        current = self.import_order()
+        wanted = np.arange(self.n_spectra) if target is None else target
+        permutation = np.argsort(current, kind='stable')[wanted]
+
+        self.tags = tags if tags is None or target is None else tags[target]
+        self.order = target
+
+        if np.array_equal(permutation, np.arange(self.n_spectra)):
+            return None
+
+        if self.out_of_core:
+            self.intensity = permute_columns(self.intensity, permutation)
+        else:
+            self.intensity = self.intensity.take(permutation, axis=1)
+        self.buffer = None
+        return permutation
+
+    def custom_axis(self):
+        if self.tags is not None:
+            return self.tags
+        return np.arange(1, self.n_spectra + 1, dtype=np.float64)
+
+    def xslice(self, x_min=None, x_max=None):
+        # Busca binaria no eixo ordenado: O(log n) em vez de mascara booleana
+        start = 0 if x_min is None else int(np.searchsorted(self.x, x_min, side='left'))
+        stop = self.x.size if x_max is None else int(np.searchsorted(self.x, x_max, side='right'))
+        return slice(start, stop)
+
+    def view(self, x_min=None, x_max=None):
+        # Recorte no eixo x que compartilha memoria com o dataset original
+        rows = self.xslice(x_min, x_max)
+        return Dataset.from_arrays(self.x[rows], self.intensity[rows], self.tags, self.order)
+
+    def x_limits(self):
+        return self.x[0], self.x[-1]
+
+    def intensity_limits(self):
+        # Bloco a bloco: a matriz pode estar mapeada do disco
+        return nanlimits(self.intensity)
+
+    def labels(self):
+        if self.tags is not None:
+            return list(self.tags)
+        return [f'y{i}' for i in range(1, self.n_spectra + 1)]
+
+    def to_frame(self, x_label='wavedata'):
+        import pandas as pd
+
+        df = pd.DataFrame(self.intensity, columns=self.labels(), copy=False)
+        df.insert(0, x_label, self.x)
+        return df
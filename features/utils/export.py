@@ -0,0 +1,152 @@
+import json
+import os
+import numpy as np
+from .SPE_Loader import load_header
+from .formats import HAS_H5PY, HAS_PYARROW
+
+# Extensao -> formato de exportacao
+FORMATS = {
+    '.csv': 'csv', '.txt': 'csv', '.dat': 'csv',
+    '.npz': 'npz',
+    '.h5': 'hdf5', '.hdf5': 'hdf5',
+    '.parquet': 'parquet',
+}
+
+FILETYPES = (
+    ('Space-separated text', '*.csv'),
+    ('Compressed NumPy archive', '*.npz'),
+    ('HDF5', '*.h5'),
+    ('Parquet', '*.parquet'),
+)
+
+# Tamanho aproximado de cada bloco de linhas escrito por vez
+CHUNK_BYTES = 8 * 1024 * 1024
+
+# 15 digitos significativos preservam os valores decimais lidos dos arquivos de texto
+CSV_FORMAT = '%.15g'
+
+
+def export_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f'Unknown export format "{extension}", use one of {", ".join(FORMATS)}')
+    return FORMATS[extension]
+
+
+def chunk_rows(dataset, chunk_bytes=CHUNK_BYTES):
+    return max(1, chunk_bytes // (8 * (dataset.n_spectra + 1)))
+
+
+def iter_chunks(dataset, rows):
+    # Blocos de linhas da view: cada bloco e uma view, nada e copiado ate a escrita
+    for start in range(0, dataset.n_points, rows):
+        yield dataset.x[start:start + rows], dataset.intensity[start:start + rows]
+
+
+def to_builtin(value):
+    if value is None:
+        return None
+    return [None if v is None else float(v) for v in value]
+
+
+def build_metadata(dataset, files=(), x_range=(None, None), counts_range=(None, None)):
+    # Tags, limites de recorte e cabecalhos SPE gravados junto com os dados
+    metadata = dict(
+        n_points=dataset.n_points,
+        n_spectra=dataset.n_spectra,
+        x_range=to_builtin(x_range),
+        counts_range=to_builtin(counts_range),
+        tags=None if dataset.tags is None else dataset.tags.tolist(),
+        files=[os.path.basename(file) for file in files],
+    )
+
+    if dataset.order is not None:
+        # Colunas ordenadas pelas tags: indice de importacao (ordem de files) de cada coluna
+        metadata['column_order'] = dataset.order.tolist()
+
+    spe = {}
+    for file in files:
+        if os.path.splitext(file)[1].lower() == '.spe':
+            try:
+                spe[os.path.basename(file)] = load_header(file).info()
+            except OSError:
+                continue
+    if spe:
+        metadata['spe'] = spe
+
+    return metadata
+
+
+def write_csv(dataset, path, metadata, rows):
+    with open(path, 'w') as file:
+        for key, value in metadata.items():
+            file.write(f'# {key}: {json.dumps(value)}\n')
+        file.write(' '.join(['wavedata'] + [str(label) for label in dataset.labels()]) + '\n')
+
+        for x, intensity in iter_chunks(dataset, rows):
+            np.savetxt(file, np.column_stack([x, intensity]), fmt=CSV_FORMAT, delimiter=' ')
+
+
+def write_npz(dataset, path, metadata, rows):
+    # O np.savez_compressed ja grava cada array em blocos dentro do zip
+    np.savez_compressed(
+        path,
+        wavedata=dataset.x,
+        intensity=dataset.intensity,
+        tags=dataset.custom_axis(),
+        metadata=np.array(json.dumps(metadata)),
+    )
+
+
+def write_hdf5(dataset, path, metadata, rows):
+    if not HAS_H5PY:
+        raise ImportError('HDF5 export requires the h5py package')
+    import h5py
+
+    with h5py.File(path, 'w') as file:
+        file.create_dataset('wavedata', data=dataset.x)
+        file.create_dataset('tags', data=dataset.custom_axis())
+        intensity = file.create_dataset(
+            'intensity',
+            shape=dataset.intensity.shape,
+            dtype=dataset.intensity.dtype,
+            chunks=(min(rows, dataset.n_points), dataset.n_spectra) if dataset.n_points else None,
+            compression='gzip',
+        )
+        for start, (_, block) in zip(range(0, dataset.n_points, rows), iter_chunks(dataset, rows)):
+            intensity[start:start + block.shape[0]] = block
+
+        for key, value in metadata.items():
+            file.attrs[key] = json.dumps(value)
+
+
+def write_parquet(dataset, path, metadata, rows):
+    if not HAS_PYARROW:
+        raise ImportError('Parquet export requires the pyarrow package')
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names = ['wavedata'] + [str(label) for label in dataset.labels()]
+    schema = pa.schema(
+        [pa.field(name, pa.float64()) for name in names],
+        metadata={'pymagplviewer': json.dumps(metadata)}
+    )
+
+    # Um row group por bloco de linhas
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for x, intensity in iter_chunks(dataset, rows):
+            columns = [pa.array(x)] + [pa.array(intensity[:, i]) for i in range(intensity.shape[1])]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+
+WRITERS = dict(csv=write_csv, npz=write_npz, hdf5=write_hdf5, parquet=write_parquet)
+
+
+def export_dataset(dataset, path, fmt=None, metadata=None, chunk_bytes=CHUNK_BYTES):
+    # Grava uma view do dataset (ja recortada em x) no formato escolhido pela extensao
+    fmt = fmt or export_format(path)
+    if fmt not in WRITERS:
+        raise ValueError(f'Unknown export format "{fmt}"')
+
+    WRITERS[fmt](dataset, path, metadata or build_metadata(dataset), chunk_rows(dataset, chunk_bytes))
+    return path
@@ -0,0 +1,48 @@
+import os
+import re
+from .formats import EXTENSIONS
+
+# Intervalo entre varreduras da pasta (ms)
+WATCH_MS = 500
+
+
+def natural_key(path):
+    # "spec_10" depois de "spec_9": os passos da varredura seguem a numeracao dos arquivos
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', os.path.basename(path))]
+
+
+class FolderWatcher:
+
+    # Varredura periodica de uma pasta (sem dependencias de notificacao do sistema)
+    def __init__(self, folder, extensions=EXTENSIONS, include_existing=True):
+        self.folder = folder
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.seen = set()
+        self.pending = {}
+
+        if not include_existing:
+            self.seen.update(self.scan())
+
+    def scan(self):
+        files = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in self.extensions:
+                    stat = entry.stat()
+                    files[os.path.realpath(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def poll(self):
+        # Um arquivo novo so e entregue quando tamanho e mtime nao mudam entre duas varreduras,
+        # ou seja, quando o espectrometro terminou de escreve-lo
+        ready = []
+        for path, stat in self.scan().items():
+            if path in self.seen:
+                continue
+            if stat[0] > 0 and self.pending.get(path) == stat:
+                del self.pending[path]
+                self.seen.add(path)
+                ready.append(path)
+            else:
+                self.pending[path] = stat
+        return sorted(ready, key=natural_key)
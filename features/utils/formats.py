@@ -0,0 +1,16 @@
+import importlib.util
+
+# Dependencias opcionais: os formatos que dependem delas so ficam disponiveis se estiverem instaladas
+HAS_H5PY = importlib.util.find_spec('h5py') is not None
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Arquivos de dados oferecidos no dialogo de importacao
+IMPORT_FILETYPES = (
+    ('Text files', '*.txt'),
+    ('Comma-separated values', '*.csv'),
+    ('Dat files', '*.dat'),
+    ('SPE files', '*.spe'),
+)
+
+# As mesmas extensoes para o modo batch e o modo watch
+EXTENSIONS = tuple(pattern[1:] for _, pattern in IMPORT_FILETYPES)
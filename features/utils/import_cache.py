@@ -0,0 +1,121 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+
+CACHE_DIR = os.environ.get(
+    'PYMAGPL_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'pymagplviewer')
+)
+MAX_CACHE_BYTES = int(os.environ.get('PYMAGPL_CACHE_MAX_BYTES', 2 * 1024**3))
+CACHE_ENABLED = os.environ.get('PYMAGPL_CACHE', '1') != '0'
+
+# Mudar a versao invalida todas as entradas gravadas por parsers antigos
+CACHE_VERSION = '3'
+
+CHUNK_BYTES = 1024**2
+FULL_HASH_LIMIT = 64 * 1024**2
+SAMPLED_CHUNKS = 16
+
+
+def content_hash(filepath, size):
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(filepath, 'rb') as file:
+        if size <= FULL_HASH_LIMIT:
+            for chunk in iter(lambda: file.read(CHUNK_BYTES), b''):
+                digest.update(chunk)
+        else:
+            # Arquivos grandes: amostra blocos espalhados pelo arquivo (tamanho e mtime tambem entram na chave)
+            for offset in np.linspace(0, size - CHUNK_BYTES, SAMPLED_CHUNKS, dtype=np.int64):
+                file.seek(int(offset))
+                digest.update(file.read(CHUNK_BYTES))
+
+    return digest.hexdigest()
+
+
+def path_hash(filepath):
+    return hashlib.blake2b(os.path.realpath(filepath).encode(), digest_size=8).hexdigest()
+
+
+class ImportCache:
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entry_path(self, filepath, options=''):
+        stat = os.stat(filepath)
+        key = hashlib.blake2b(digest_size=16)
+        for part in (CACHE_VERSION, os.path.realpath(filepath), stat.st_size, stat.st_mtime_ns,
+                     content_hash(filepath, stat.st_size), options):
+            key.update(str(part).encode())
+            key.update(b'\0')
+
+        # O prefixo com o hash do caminho permite invalidar todas as entradas de um arquivo
+        return os.path.join(self.directory, f'{path_hash(filepath)}-{key.hexdigest()}.npy')
+
+    def load(self, filepath, options=''):
+        entry = self.entry_path(filepath, options)
+        try:
+            data = np.load(entry, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+        # Atualiza o mtime da entrada para a politica LRU
+        os.utime(entry)
+        return data
+
+    def store(self, filepath, data, options=''):
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self.entry_path(filepath, options)
+
+        # Grava em um arquivo temporario e renomeia para nao deixar entradas parciais
+        # Nome unico por chamada: threads do mesmo processo podem gravar a mesma entrada ao mesmo tempo
+        handle, temporary = tempfile.mkstemp(prefix=os.path.basename(entry) + '.', suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.save(file, np.ascontiguousarray(data), allow_pickle=False)
+            os.replace(temporary, entry)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+        self.evict()
+
+    def entries(self):
+        try:
+            with os.scandir(self.directory) as scan:
+                return [entry for entry in scan if entry.name.endswith('.npy')]
+        except FileNotFoundError:
+            return []
+
+    def evict(self):
+        stats = sorted(((entry.stat(), entry.path) for entry in self.entries()), key=lambda item: item[0].st_mtime)
+        total = sum(stat.st_size for stat, _ in stats)
+
+        # Remove as entradas usadas ha mais tempo ate caber no limite
+        for stat, path in stats:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= stat.st_size
+            except OSError:
+                pass
+
+    def invalidate(self, filepath):
+        prefix = f'{path_hash(filepath)}-'
+        for entry in self.entries():
+            if entry.name.startswith(prefix):
+                os.remove(entry.path)
+
+    def clear(self):
+        for entry in self.entries():
+            os.remove(entry.path)
+
+
+default_cache = ImportCache()
@@ -0,0 +1,166 @@
+import threading
+import weakref
+import numpy as np
+from collections import OrderedDict
+from .out_of_core import map_columns, map_to_store
+
+# Metodos com um valor por espectro; a integral acumulada tem sua propria entrada (cumulative_view)
+METHODS = ('trapezoid', 'simpson')
+BASELINES = ('none', 'linear', 'min')
+
+
+def prepare(Y, absolute=True):
+    # Lacunas (NaN) do join contam como zero; abs so e aplicado se houver valores negativos
+    if np.isnan(Y).any():
+        Y = np.nan_to_num(Y)
+    if absolute and Y.size and Y.min() < 0:
+        Y = np.abs(Y)
+    return Y
+
+
+def trapezoid(x, Y):
+    # Produtos matriz-vetor: nenhuma copia (n_x, n_espectros) e criada
+    if x.size < 2:
+        return np.zeros(Y.shape[1])
+    dx = np.diff(x)
+    return 0.5 * (dx @ Y[1:] + dx @ Y[:-1])
+
+
+def cumulative(x, Y):
+    # Integral acumulada (n_x, n_espectros), comecando em zero
+    result = np.zeros(Y.shape, dtype=np.float64)
+    if x.size > 1:
+        np.cumsum(0.5 * np.diff(x)[:, np.newaxis] * (Y[1:] + Y[:-1]), axis=0, out=result[1:])
+    return result
+
+
+def simpson(x, Y):
+    # Simpson composto para espacamento nao uniforme; com numero impar de intervalos o ultimo usa trapezio
+    intervals = x.size - 1
+    if intervals < 2:
+        return trapezoid(x, Y)
+
+    pairs = intervals - intervals % 2
+    h = np.diff(x[:pairs + 1])
+    h0, h1 = h[0::2], h[1::2]
+    total = h0 + h1
+
+    w0 = total / 6 * (2 - h1 / h0)
+    w1 = total / 6 * total**2 / (h0 * h1)
+    w2 = total / 6 * (2 - h0 / h1)
+
+    result = w0 @ Y[0:pairs:2] + w1 @ Y[1:pairs:2] + w2 @ Y[2:pairs + 1:2]
+
+    if intervals % 2:
+        result += trapezoid(x[-2:], Y[-2:])
+
+    return result
+
+
+def baseline_area(x, Y, baseline):
+    # Area sob a linha de base de cada espectro no intervalo
+    if baseline == 'none' or x.size < 2:
+        return 0
+    width = x[-1] - x[0]
+    if baseline == 'linear':
+        # Reta ligando as bordas da janela
+        return width * (Y[0] + Y[-1]) / 2
+    if baseline == 'min':
+        return width * Y.min(axis=0)
+    raise ValueError(f'Unknown baseline {baseline!r}, expected one of {BASELINES}')
+
+
+def baseline_curve(x, Y, baseline):
+    # Linha de base avaliada em todo o eixo (usada so pela integral acumulada)
+    if baseline == 'linear':
+        fraction = (x - x[0]) / (x[-1] - x[0])
+        return Y[0] + fraction[:, np.newaxis] * (Y[-1] - Y[0])
+    if baseline == 'min':
+        return np.broadcast_to(Y.min(axis=0), Y.shape)
+    raise ValueError(f'Unknown baseline {baseline!r}, expected one of {BASELINES}')
+
+
+def integrate(x, Y, method='trapezoid', baseline='none', absolute=True):
+    Y = prepare(Y, absolute)
+
+    if method == 'trapezoid':
+        result = trapezoid(x, Y)
+    elif method == 'simpson':
+        result = simpson(x, Y)
+    else:
+        raise ValueError(f'Unknown integration method {method!r}, expected one of {METHODS}')
+
+    return result - baseline_area(x, Y, baseline)
+
+
+def cumulative_integral(x, Y, baseline='none', absolute=True):
+    # Curva (n_x, n_espectros) da integral desde o inicio da janela; o ultimo ponto e a integral por trapezio
+    Y = prepare(Y, absolute)
+    result = cumulative(x, Y)
+    if baseline != 'none' and x.size > 1:
+        result -= cumulative(x, baseline_curve(x, Y, baseline))
+    return result
+
+
+def integrate_view(view, method='trapezoid', baseline='none', absolute=True):
+    # Blocos de colunas dentro do orcamento de memoria (matrizes grandes ou mapeadas do disco)
+    return map_columns(lambda Y: integrate(view.x, Y, method, baseline, absolute), view.intensity)
+
+
+def cumulative_view(view, baseline='none', absolute=True):
+    # Resultado do tamanho da view: uma view mapeada do disco gera um armazenamento em disco
+    return map_to_store(lambda Y: cumulative_integral(view.x, Y, baseline, absolute), view.intensity)
+
+
+def integrate_windows(dataset, windows, method='trapezoid', baseline='none', absolute=True):
+    # Integra varias janelas espectrais de uma vez: resultado (n_janelas, n_espectros)
+    results = []
+    for x_min, x_max in windows:
+        view = dataset.view(x_min, x_max)
+        results.append(integrate_view(view, method, baseline, absolute))
+    return np.array(results)
+
+
+class IntegrationEngine:
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        # Usado pelo thread do Tk (modo watch) e pelo worker do TaskScheduler ao mesmo tempo
+        self._lock = threading.Lock()
+
+    def integrate(self, dataset, windows, method='trapezoid', baseline='none', absolute=True):
+        # Cada janela tem sua propria entrada: mudar uma janela nao recalcula as outras
+        return np.array([
+            self.integrate_window(dataset, window, method, baseline, absolute)
+            for window in windows
+        ])
+
+    def integrate_window(self, dataset, window, method, baseline, absolute):
+        matrix = dataset.intensity
+        key = (id(matrix), matrix.shape, tuple(window), method, baseline, absolute)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            # Referencia fraca: a matriz so e a mesma se ainda estiver viva, entao um id reutilizado nao acerta
+            if entry is not None and entry[0]() is matrix:
+                self._cache.move_to_end(key)
+                return entry[1]
+
+        # O calculo fica fora do lock: o outro thread nao espera por ele
+        result = integrate_view(dataset.view(*window), method, baseline, absolute)
+
+        with self._lock:
+            # Resultados de matrizes ja liberadas (pre-processamento trocado, novo import) saem do cache
+            for stale in [cached for cached, (reference, _) in self._cache.items() if reference() is None]:
+                del self._cache[stale]
+
+            self._cache[key] = (weakref.ref(matrix), result)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,132 @@
+import numpy as np
+
+# Opcoes de eixo comum oferecidas na interface: uniao dos eixos (NaN onde falta ponto) ou grade reamostrada
+GRID_OPTIONS = ('Union', 'Auto')
+
+
+def split_block(block):
+    # Cada bloco importado e uma matriz 2-D: coluna 0 = eixo x, demais = espectros
+    block = np.asarray(block, dtype=np.float64)
+    return block[:, 0], block[:, 1:]
+
+
+def shares_axis(axes):
+    first = axes[0]
+    return all(x.shape == first.shape and np.array_equal(x, first) for x in axes[1:])
+
+
+def parse_grid(text):
+    # "Union"/vazio -> None, "Auto" -> grade automatica, "inicio:fim:passo" -> grade do usuario
+    text = str(text).strip()
+    if text.lower() in ('', 'none', 'union'):
+        return None
+    if text.lower() == 'auto':
+        return 'auto'
+
+    from .tags import interval_values
+
+    try:
+        start, stop, step = map(float, text.split(':'))
+    except ValueError:
+        raise ValueError(f'Invalid grid {text!r}: use Auto or START:STOP:STEP') from None
+    return interval_values(start, stop, step)
+
+
+def common_grid(axes):
+    # Grade uniforme no intervalo coberto por todos os eixos, com a resolucao do eixo mais denso
+    low = max(axis.min() for axis in axes)
+    high = min(axis.max() for axis in axes)
+    if not low < high:
+        raise ValueError('The x axes of the imported files do not overlap')
+
+    points = max(int(np.count_nonzero((axis >= low) & (axis <= high))) for axis in axes)
+    return np.linspace(low, high, max(points, 2))
+
+
+def resample(x, Y, grid, out=None):
+    # Interpolacao linear de todas as colunas de Y (n_x, k) de uma vez, como np.interp em lote
+    # Os indices e pesos sao calculados uma unica vez para o eixo; pontos fora de x ficam NaN
+    if x.size > 1 and np.any(np.diff(x) < 0):
+        order = np.argsort(x, kind='stable')
+        x, Y = x[order], Y[order]
+
+    if out is None:
+        out = np.empty((grid.size, Y.shape[1]), dtype=np.float64)
+
+    if x.size == grid.size and np.array_equal(x, grid):
+        out[...] = Y
+        return out
+
+    if x.size < 2:
+        # Sem intervalo para interpolar: o unico ponto (se houver) so cai na grade onde coincide com ela
+        out.fill(np.nan)
+        if x.size:
+            out[grid == x[0]] = Y[0]
+        return out
+
+    right = np.clip(np.searchsorted(x, grid, side='right'), 1, x.size - 1)
+    left = right - 1
+    span = x[right] - x[left]
+    weight = np.divide(grid - x[left], span, out=np.zeros_like(grid), where=span != 0)[:, np.newaxis]
+
+    np.multiply(Y[left], 1 - weight, out=out)
+    out += Y[right] * weight
+    out[(grid < x[0]) | (grid > x[-1])] = np.nan
+    return out
+
+
+def resample_spectra(blocks, grid):
+    # Matriz densa (n_grid, n_espectros) alocada uma vez; cada bloco e interpolado direto na sua fatia
+    axes, spectra = zip(*(split_block(block) for block in blocks))
+    if isinstance(grid, str):
+        if shares_axis(axes):
+            # Mesma calibracao em todos os arquivos: nada a reamostrar
+            return join_spectra(blocks)
+        grid = common_grid(axes)
+    grid = np.asarray(grid, dtype=np.float64)
+
+    widths = [y.shape[1] for y in spectra]
+    bounds = np.concatenate(([0], np.cumsum(widths)))
+
+    matrix = np.empty((grid.size, bounds[-1]), dtype=np.float64)
+    for axis, y, start, stop in zip(axes, spectra, bounds[:-1], bounds[1:]):
+        resample(axis, y, grid, out=matrix[:, start:stop])
+
+    return grid, matrix
+
+
+def join_spectra(blocks, grid=None):
+    # Junta todos os arquivos de uma vez, retornando (x ordenado, matriz de intensidades float64)
+    # grid: None (uniao dos eixos), 'auto' (grade comum) ou array com o eixo de destino
+    if len(blocks) == 0:
+        return np.empty(0), np.empty((0, 0))
+
+    if grid is not None:
+        return resample_spectra(blocks, grid)
+
+    axes, spectra = zip(*(split_block(block) for block in blocks))
+
+    widths = [y.shape[1] for y in spectra]
+    bounds = np.concatenate(([0], np.cumsum(widths)))
+
+    if shares_axis(axes):
+        # Caminho rapido: mesmo eixo x em todos os arquivos, empilha as colunas diretamente
+        x = axes[0]
+        order = None
+        if np.any(np.diff(x) < 0):
+            order = np.argsort(x, kind='stable')
+            x = x[order]
+
+        matrix = np.empty((x.size, bounds[-1]), dtype=np.float64)
+        for y, start, stop in zip(spectra, bounds[:-1], bounds[1:]):
+            matrix[:, start:stop] = y if order is None else y[order]
+        return x, matrix
+
+    # Uniao ordenada de todos os eixos em uma unica passada; pontos ausentes ficam NaN
+    x = np.unique(np.concatenate(axes))
+    matrix = np.full((x.size, bounds[-1]), np.nan, dtype=np.float64)
+    for axis, y, start, stop in zip(axes, spectra, bounds[:-1], bounds[1:]):
+        rows = np.searchsorted(x, axis)
+        matrix[rows, start:stop] = y
+
+    return x, matrix
@@ -0,0 +1,112 @@
+import numpy as np
+from .dataset import Dataset
+from .integration import integrate_view
+from .out_of_core import map_columns
+
+PATTERNS = ('raster', 'serpentine')
+
+
+def scan_shape(n_spectra, nx=None, ny=None):
+    # Dimensoes da varredura; sem nx/ny a varredura e assumida quadrada
+    if nx is None and ny is None:
+        nx = ny = int(round(np.sqrt(n_spectra)))
+    elif nx is None:
+        nx = n_spectra // ny
+    elif ny is None:
+        ny = n_spectra // nx
+
+    if nx * ny != n_spectra:
+        raise ValueError(f'{n_spectra} spectra do not fill a {nx} x {ny} scan')
+    return nx, ny
+
+
+def pixel_index(nx, ny, pattern='raster'):
+    # Indice do espectro (coluna da matriz) de cada pixel (iy, ix) do mapa
+    index = np.arange(nx * ny).reshape(ny, nx)
+    if pattern == 'serpentine':
+        # Linhas impares sao percorridas no sentido inverso
+        index[1::2] = index[1::2, ::-1]
+    elif pattern != 'raster':
+        raise ValueError(f'Unknown scan pattern {pattern!r}, expected one of {PATTERNS}')
+    return index
+
+
+class SpatialMap:
+
+    # Espectros de uma varredura espacial: dataset (n_lambda, ny * nx) + indice (ny, nx) dos pixels
+    __slots__ = ('dataset', 'nx', 'ny', 'pattern', 'index')
+
+    def __init__(self, dataset, nx=None, ny=None, pattern='raster'):
+        self.dataset = dataset
+        self.nx, self.ny = scan_shape(dataset.n_spectra, nx, ny)
+        self.pattern = pattern
+        self.index = pixel_index(self.nx, self.ny, pattern)
+
+    @classmethod
+    def from_arrays(cls, x, intensity, nx=None, ny=None, pattern='raster'):
+        # Sem copia float64: frames SPE mapeados continuam no tipo do arquivo, e as reducoes
+        # convertem um bloco de colunas por vez (map_columns)
+        return cls(Dataset.from_store(x, intensity), nx, ny, pattern)
+
+    @property
+    def shape(self):
+        return self.ny, self.nx
+
+    @property
+    def x(self):
+        return self.dataset.x
+
+    def spectrum(self, iy, ix):
+        # View da coluna do pixel, sem copia
+        return self.dataset.intensity[:, self.index[iy, ix]]
+
+    def cube(self, x_min=None, x_max=None):
+        # Array (ny, nx, n_lambda); na varredura raster e uma view da matriz original
+        view = self.dataset.view(x_min, x_max)
+        spectra = view.intensity.T
+        if self.pattern == 'raster':
+            return spectra.reshape(self.ny, self.nx, view.n_points)
+        return spectra[self.index]
+
+    def image(self, values):
+        # Valores por espectro (n_spectra,) -> imagem (ny, nx)
+        return np.asarray(values)[self.index]
+
+    def integrated_image(self, x_min=None, x_max=None, method='trapezoid', baseline='none', absolute=True):
+        view = self.dataset.view(x_min, x_max)
+        return self.image(integrate_view(view, method, baseline, absolute))
+
+    def max_image(self, x_min=None, x_max=None):
+        view = self.dataset.view(x_min, x_max)
+        return self.image(map_columns(lambda Y: np.nanmax(Y, axis=0), view.intensity))
+
+    def peak_image(self, x_min=None, x_max=None, refine=True):
+        # Posicao do maximo de cada espectro na janela; refine ajusta uma parabola nos 3 pontos do pico
+        view = self.dataset.view(x_min, x_max)
+        if view.n_points == 0:
+            return np.full(self.shape, np.nan)
+
+        return self.image(map_columns(lambda Y: peak_positions(view.x, Y, refine), view.intensity))
+
+
+def peak_positions(x, Y, refine=True):
+    # Posicao do maximo de cada coluna de Y (um bloco float64 do mapa)
+    Y = np.where(np.isnan(Y), -np.inf, Y)
+    peak = np.argmax(Y, axis=0)
+    position = x[peak]
+
+    if refine and x.size > 2:
+        inner = np.clip(peak, 1, x.size - 2)
+        columns = np.arange(Y.shape[1])
+        left, center, right = Y[inner - 1, columns], Y[inner, columns], Y[inner + 1, columns]
+
+        curvature = left - 2 * center + right
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offset = np.where(curvature < 0, 0.5 * (left - right) / curvature, 0)
+        offset = np.where((inner == peak) & np.isfinite(offset), np.clip(offset, -0.5, 0.5), 0)
+
+        # Passo local do eixo (nao uniforme) em torno do pico
+        step = np.where(offset < 0, x[inner] - x[inner - 1], x[inner + 1] - x[inner])
+        position = position + offset * step
+
+    return position
@@ -0,0 +1,244 @@
+import os
+import re
+import tempfile
+import numpy as np
+from .formats import HAS_H5PY
+
+
+def parse_size(text):
+    # "512M", "2G", "1048576" -> bytes
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)B?\s*', str(text), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f'Invalid memory size {text!r}')
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' KMGT'.index(unit.upper() or ' '))
+
+
+# Memoria de trabalho permitida para as matrizes de intensidade e seus temporarios
+MEMORY_BUDGET = parse_size(os.environ.get('PYMAGPL_MEMORY_BUDGET', '1G'))
+
+# Onde ficam as matrizes grandes gravadas em disco (.npy ou .h5 mapeados em memoria)
+STORE_DIR = os.environ.get('PYMAGPL_STORE_DIR', os.path.join(tempfile.gettempdir(), 'pymagplviewer'))
+
+# Copias temporarias que uma operacao vetorizada faz de cada bloco (NaN -> 0, abs, produtos)
+TEMPORARY_COPIES = 4
+
+
+def get_budget(budget=None):
+    return MEMORY_BUDGET if budget is None else budget
+
+
+def set_budget(budget):
+    # Aceita bytes ou texto ("512M", "4G")
+    global MEMORY_BUDGET
+    MEMORY_BUDGET = budget if isinstance(budget, int) else parse_size(budget)
+
+
+def is_mapped(array):
+    # Views (fatias, transposta) de um np.memmap continuam sendo np.memmap
+    return isinstance(array, np.memmap)
+
+
+def column_blocks(n_rows, n_cols, budget=None, itemsize=8, copies=TEMPORARY_COPIES):
+    # Fatias de colunas cujo processamento cabe no orcamento de memoria
+    budget = get_budget(budget)
+    width = max(1, int(budget // max(n_rows * itemsize * copies, 1)))
+    return [slice(start, min(start + width, n_cols)) for start in range(0, n_cols, width)] or [slice(0, 0)]
+
+
+def map_columns(function, Y, budget=None):
+    # Aplica function a blocos de colunas de Y (n_x, n_espectros) e junta os resultados no ultimo eixo
+    # Cada bloco chega como float64: um store SPE mapeado mantem o tipo do arquivo (uint16 transbordaria nas somas)
+    blocks = column_blocks(Y.shape[0], Y.shape[1], budget)
+    if len(blocks) == 1:
+        return function(np.asarray(Y, dtype=np.float64))
+    return np.concatenate([function(np.asarray(Y[:, block], dtype=np.float64)) for block in blocks], axis=-1)
+
+
+def map_to_store(function, Y, budget=None):
+    # Como map_columns, mas para resultados do tamanho de Y: uma matriz mapeada gera outra em disco
+    if not is_mapped(Y):
+        return map_columns(function, Y, budget)
+
+    store, path = create_store(Y.shape[1], Y.shape[0])
+    for block in column_blocks(Y.shape[0], Y.shape[1], budget):
+        store[block] = function(np.asarray(Y[:, block], dtype=np.float64)).T
+    store.flush()
+    release(path)
+    return store.T
+
+
+def nanlimits(Y, budget=None):
+    # Minimo e maximo ignorando NaN, bloco a bloco
+    low, high = np.inf, -np.inf
+    for block in column_blocks(Y.shape[0], Y.shape[1], budget, copies=2):
+        values = np.asarray(Y[:, block], dtype=np.float64)
+        if values.size and not np.isnan(values).all():
+            low = min(low, np.nanmin(values))
+            high = max(high, np.nanmax(values))
+    if low > high:
+        return np.nan, np.nan
+    return low, high
+
+
+def store_path(suffix):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    handle, path = tempfile.mkstemp(suffix=suffix, dir=STORE_DIR)
+    os.close(handle)
+    return path
+
+
+def release(path):
+    # O mapeamento continua valido depois de apagar o arquivo (POSIX): o disco e liberado
+    # quando o dataset deixa de ser usado. No Windows o arquivo fica ate ser apagado pelo sistema.
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def create_store(n_spectra, n_points, dtype=np.float64, backend='npy', path=None):
+    # Matriz (n_espectros, n_x) em disco: cada espectro e contiguo, como nos frames SPE
+    shape = (n_spectra, n_points)
+
+    if backend == 'npy':
+        path = path or store_path('.npy')
+        store = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    elif backend == 'hdf5':
+        if not HAS_H5PY:
+            raise ImportError('The HDF5 store requires the h5py package')
+        import h5py
+
+        path = path or store_path('.h5')
+        with h5py.File(path, 'w') as file:
+            # Layout contiguo (sem compressao) para que o bloco possa ser mapeado diretamente
+            dataset = file.create_dataset('intensity', shape=shape, dtype=dtype, fillvalue=np.nan)
+            dataset[-1, -1] = np.nan
+            offset = dataset.id.get_offset()
+        store = np.memmap(path, dtype=dtype, mode='r+', offset=offset, shape=shape)
+    else:
+        raise ValueError(f'Unknown store backend {backend!r}')
+
+    return store, path
+
+
+def copy_to_store(intensity, capacity=None, budget=None, backend='npy'):
+    # Copia uma matriz (n_x, n_espectros) para um armazenamento float64 com `capacity` colunas
+    # (colunas livres no fim para append) e devolve a view mapeada (n_x, capacity)
+    capacity = intensity.shape[1] if capacity is None else capacity
+    store, path = create_store(capacity, intensity.shape[0], backend=backend)
+    for block in column_blocks(intensity.shape[0], intensity.shape[1], budget, copies=1):
+        store[block] = intensity[:, block].T
+    store.flush()
+    release(path)
+    return store.T
+
+
+def spill(x, intensity, budget=None, backend='npy'):
+    # Copia uma matriz (n_x, n_espectros) para o disco em blocos e devolve a view mapeada (n_x, n_espectros)
+    return x, copy_to_store(intensity, budget=budget, backend=backend)
+
+
+def permute_columns(intensity, order, budget=None, backend='npy'):
+    # Reordena os espectros de uma matriz mapeada em um novo armazenamento, bloco a bloco
+    store, path = create_store(intensity.shape[1], intensity.shape[0], backend=backend)
+    for block in column_blocks(intensity.shape[0], intensity.shape[1], budget, copies=1):
+        store[block] = intensity[:, order[block]].T
+    store.flush()
+    release(path)
+    return store.T
+
+
+def spe_series(paths, rows=None, binning=None, budget=None, backend='npy', grid=None, on_progress=None):
+    # Serie de arquivos SPE como uma unica matriz mapeada (n_x, n_espectros), lida em blocos de frames
+    # Calibracoes diferentes: uniao dos eixos (grid=None, NaN onde falta ponto) ou reamostragem (grid='auto'/array)
+    from .SPE_Loader import read_spe
+    from .join_engine import common_grid, resample
+
+    readers = [read_spe(path) for path in paths]
+    headers = [reader.getHeader() for reader in readers]
+    axes = [header.Wavedata for header in headers]
+    same = all(np.array_equal(axis, axes[0]) for axis in axes[1:])
+
+    if grid is None:
+        x = axes[0] if same else np.unique(np.concatenate(axes))
+    elif isinstance(grid, str):
+        x = axes[0] if same else common_grid(axes)
+    else:
+        x = np.asarray(grid, dtype=np.float64)
+    resampled = grid is not None and not (x.size == axes[0].size and same and np.array_equal(x, axes[0]))
+
+    header = headers[0]
+    if (len(readers) == 1 and not resampled and header.Height == 1 and rows is None and binning is None
+            and header.FrameStride == header.Count * header.itemsize):
+        # Frames 1-D contiguos: o proprio arquivo SPE e o armazenamento, sem copia
+        return x, readers[0].getFrames().T
+
+    counts = [reader.getBinned(rows, binning, slice(0, 1)).shape[0] * header.Frame
+              for reader, header in zip(readers, headers)]
+    store, path = create_store(sum(counts), x.size, backend=backend)
+
+    start = 0
+    for done, (reader, header, axis) in enumerate(zip(readers, headers, axes), start=1):
+        per_frame = header.Height * max(header.Width, x.size) * 8
+        frames = max(1, int(get_budget(budget) // (per_frame * 2)))
+        for first in range(0, header.Frame, frames):
+            spectra = reader.getBinned(rows, binning, slice(first, first + frames))
+            stop = start + spectra.shape[0]
+            if resampled:
+                store[start:stop] = resample(axis, np.asarray(spectra, dtype=np.float64).T, x).T
+            elif axis is x or np.array_equal(axis, x):
+                store[start:stop] = spectra
+            else:
+                # Uniao dos eixos: cada arquivo preenche so os seus pontos
+                store[start:stop] = np.nan
+                store[start:stop, np.searchsorted(x, axis)] = spectra
+            start = stop
+
+        if on_progress is not None:
+            on_progress(done, len(paths), paths[done - 1], None)
+
+    store.flush()
+    release(path)
+    return x, store.T
+
+
+def estimated_bytes(paths, rows=None, binning=None):
+    # Tamanho aproximado da matriz float64 depois da importacao
+    from .SPE_Loader import read_spe
+
+    total = 0
+    for path in paths:
+        if os.path.splitext(path)[1].lower() == '.spe':
+            header = read_spe(path).getHeader()
+            height = header.Height if rows is None else len(range(*slice(*rows).indices(header.Height)))
+            bins = 1 if binning is None else max(height // int(binning), 1)
+            total += header.Frame * bins * header.Width * 8
+        else:
+            # Texto: ~2 bytes de arquivo por byte de float64
+            total += os.path.getsize(path) // 2
+    return total
+
+
+def exceeds_budget(paths, rows=None, binning=None, budget=None):
+    try:
+        return estimated_bytes(paths, rows, binning) > get_budget(budget)
+    except (OSError, ValueError):
+        return False
+
+
+def import_out_of_core(paths, sep='Auto', rows=None, binning=None, on_progress=None, budget=None, backend='npy',
+                       grid=None):
+    # Importacao maior que o orcamento: SPE lidos em blocos para o disco (ou mapeados direto);
+    # texto unido em memoria e copiado para o disco
+    from .parallel_import import import_files
+
+    if all(os.path.splitext(path)[1].lower() == '.spe' for path in paths):
+        # Um arquivo ilegivel interrompe a serie inteira: nao ha como juntar o resto sem carregar tudo
+        x, intensity = spe_series(paths, rows, binning, budget, backend, grid, on_progress)
+        return x, intensity, {}
+
+    x, intensity, errors = import_files(paths, sep, on_progress=on_progress, rows=rows, binning=binning, grid=grid)
+    if intensity.size == 0:
+        return x, intensity, errors
+    return (*spill(x, intensity, budget, backend), errors)
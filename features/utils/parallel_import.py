@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from .SPE_Loader import read_spe
+from .join_engine import join_spectra
+from .text_parser import parse_text
+from .import_cache import default_cache, CACHE_ENABLED
+from .profiling import section
+
+
+def worker_count(num_files):
+    return max(1, min(num_files, os.cpu_count() or 1))
+
+
+def read_file(filepath, sep='Auto', rows=None, binning=None):
+    extension = os.path.splitext(filepath)[1].lower()
+
+    if extension != '.spe':
+        return parse_text(filepath, sep)
+
+    # Frames 2-D do CCD sao binados na leitura: so os espectros resultantes vao para a memoria
+    spe = read_spe(filepath)
+    spectra = spe.getBinned(rows, binning)
+    data = np.empty((spectra.shape[1], spectra.shape[0] + 1), dtype=np.float64)
+    data[:, 0] = spe.getHeader().Wavedata
+    data[:, 1:] = spectra.T
+
+    return data[np.isfinite(data).all(axis=1)]
+
+
+def parse_file(filepath, sep='Auto', cache=CACHE_ENABLED, rows=None, binning=None):
+    # Le um arquivo e devolve uma matriz float64 (coluna 0 = x), passando pelo cache em disco
+    if os.path.splitext(filepath)[1].lower() == '.spe':
+        options = '' if rows is None and binning is None else f'rows={rows} binning={binning}'
+    else:
+        options = sep
+
+    with section('parse_file', file=os.path.basename(filepath)) as sizes:
+        data = default_cache.load(filepath, options) if cache else None
+        sizes['cached'] = data is not None
+
+        if data is None:
+            data = read_file(filepath, sep, rows, binning)
+
+            if cache:
+                try:
+                    default_cache.store(filepath, data, options)
+                except OSError:
+                    # Cache indisponivel (disco cheio, sem permissao): segue sem cache
+                    pass
+
+        sizes['data'] = data
+
+    return data
+
+
+def iter_parsed(paths, sep='Auto', processes=False, rows=None, binning=None):
+    # Gera (indice, caminho, bloco, erro) a medida que cada arquivo termina, fora de ordem
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+    with executor(max_workers=worker_count(len(paths))) as pool:
+        futures = {pool.submit(parse_file, path, sep, CACHE_ENABLED, rows, binning): index for index, path in enumerate(paths)}
+
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, paths[index], future.result(), None
+            except Exception as error:
+                yield index, paths[index], None, error
+
+
+def import_files(paths, sep='Auto', processes=False, on_progress=None, rows=None, binning=None, grid=None):
+    # Importa todos os arquivos em paralelo e faz o join mantendo a ordem original
+    # grid: None junta pela uniao dos eixos; 'auto' ou um array reamostra tudo em um eixo comum
+    blocks = [None] * len(paths)
+    errors = {}
+
+    for done, (index, path, block, error) in enumerate(iter_parsed(paths, sep, processes, rows, binning), start=1):
+        if error is None and grid is not None and block.shape[0] < 2:
+            # Um unico ponto valido nao define intervalo para reamostrar: o arquivo e pulado, nao o import
+            error = ValueError(f'{os.path.basename(path)} has fewer than two valid points to resample')
+
+        if error is None:
+            blocks[index] = block
+        else:
+            errors[path] = error
+
+        if on_progress is not None:
+            on_progress(done, len(paths), path, error)
+
+    with section('join_spectra', blocks=len(blocks) - len(errors)):
+        x, intensities = join_spectra([block for block in blocks if block is not None], grid)
+
+    return x, intensities, errors
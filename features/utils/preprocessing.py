@@ -0,0 +1,258 @@
+import threading
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .dataset import Dataset
+from .integration import trapezoid
+from .out_of_core import map_to_store
+
+# Ordem fixa das etapas: mudar um parametro so recalcula a etapa alterada e as seguintes
+STAGES = ('spikes', 'smooth', 'baseline', 'normalize')
+
+BASELINE_METHODS = ('poly', 'als')
+NORMALIZATIONS = ('max', 'area', 'vector')
+
+# Iteracoes maximas do ajuste polinomial modificado (ModPoly) e do ALS
+POLY_ITERATIONS = 100
+ALS_ITERATIONS = 10
+
+
+def finite_groups(function, x, Y):
+    # Espectros com NaN (join pela uniao dos eixos): as colunas com os mesmos pontos finitos sao
+    # processadas juntas, so nesses pontos, e os NaN voltam para o lugar depois
+    finite = ~np.isnan(Y)
+    result = np.full(Y.shape, np.nan)
+    masks, groups = np.unique(finite.T, axis=0, return_inverse=True)
+    groups = groups.ravel()
+
+    for index, mask in enumerate(masks):
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            continue
+        cells = np.ix_(rows, np.flatnonzero(groups == index))
+        result[cells] = function(None if x is None else x[rows], Y[cells])
+    return result
+
+
+def remove_spikes(x, Y, threshold=6.0, window=5):
+    # Raios cosmicos: pontos muito acima da mediana local (janela ao longo de x) viram a mediana
+    # O limiar e dado em desvios robustos (MAD) do residuo de cada espectro
+    window = int(window) | 1
+    half = window // 2
+    Y = np.asarray(Y, dtype=np.float64)
+    if np.isnan(Y).any():
+        return finite_groups(lambda x, Y: remove_spikes(x, Y, threshold, window), x, Y)
+    if Y.shape[0] < window:
+        return Y.copy()
+
+    padded = np.pad(Y, ((half, half), (0, 0)), mode='edge')
+    median = np.median(sliding_window_view(padded, window, axis=0), axis=-1)
+
+    result = np.array(Y, dtype=np.float64)
+    residual = result - median
+    sigma = 1.4826 * np.median(np.abs(residual), axis=0)
+    spikes = residual > float(threshold) * np.where(sigma > 0, sigma, np.inf)
+    result[spikes] = median[spikes]
+    return result
+
+
+def savgol_coefficients(window, order):
+    # Projecao de cada janela no polinomio de minimos quadrados: linha central e bordas
+    positions = np.arange(window) - window // 2
+    vandermonde = np.vander(positions, order + 1, increasing=True)
+    return vandermonde @ np.linalg.pinv(vandermonde)
+
+
+def savgol(x, Y, window=11, order=3):
+    # Savitzky-Golay ao longo de x para todas as colunas; as bordas usam o ajuste da primeira/ultima janela
+    # Supoe pontos igualmente espacados (pixels do detector)
+    window, order = int(window), int(order)
+    if window % 2 == 0 or window <= order:
+        raise ValueError(f'Savitzky-Golay needs an odd window larger than the order, got {window}:{order}')
+
+    Y = np.asarray(Y, dtype=np.float64)
+    if np.isnan(Y).any():
+        # Os pontos finitos de cada espectro sao filtrados como consecutivos
+        return finite_groups(lambda x, Y: savgol(x, Y, window, order), x, Y)
+    half = window // 2
+    if Y.shape[0] < window:
+        return Y.copy()
+
+    projection = savgol_coefficients(window, order)
+    center = projection[half]
+
+    # Uma passada vetorizada por coeficiente: sem copia (n_x, n_espectros, janela)
+    result = np.zeros_like(Y)
+    inner = result[half:Y.shape[0] - half]
+    for offset, coefficient in enumerate(center):
+        inner += coefficient * Y[offset:offset + inner.shape[0]]
+
+    result[:half] = projection[:half] @ Y[:window]
+    result[Y.shape[0] - half:] = projection[half + 1:] @ Y[-window:]
+    return result
+
+
+def poly_baseline(x, Y, degree=3, tolerance=1e-3):
+    # ModPoly: o polinomio e reajustado ao minimo entre o espectro e o ajuste anterior
+    # Uma unica pseudo-inversa atende todos os espectros
+    Y = np.asarray(Y, dtype=np.float64)
+    if np.isnan(Y).any():
+        # Minimos quadrados so nas linhas finitas de cada grupo de espectros
+        return finite_groups(lambda x, Y: poly_baseline(x, Y, degree, tolerance), x, Y)
+    span = x[-1] - x[0] if x.size > 1 else 1.0
+    scaled = 2 * (x - x[0]) / (span or 1.0) - 1
+    vandermonde = np.vander(scaled, int(degree) + 1)
+    inverse = np.linalg.pinv(vandermonde)
+
+    working = Y.copy()
+    for _ in range(POLY_ITERATIONS):
+        fit = vandermonde @ (inverse @ working)
+        updated = np.minimum(working, fit)
+        change = np.linalg.norm(updated - working, axis=0) / np.maximum(np.linalg.norm(working, axis=0), 1e-12)
+        working = updated
+        if change.max(initial=0) < tolerance:
+            break
+
+    return Y - vandermonde @ (inverse @ working)
+
+
+def second_difference_bands(n):
+    # Bandas de D'D (D = segunda diferenca): diagonal, primeira e segunda subdiagonais
+    main = np.zeros(n)
+    main[:-2] += 1
+    main[1:-1] += 4
+    main[2:] += 1
+    first = np.zeros(n - 1)
+    first[:-1] -= 2
+    first[1:] -= 2
+    return main, first, np.ones(n - 2)
+
+
+def solve_pentadiagonal(main, first, second, b):
+    # LDL' de matrizes simetricas pentadiagonais, uma por coluna de b (n, k)
+    # main (n, k) varia por coluna; first e second sao compartilhadas
+    n = b.shape[0]
+    diagonal = np.empty_like(b)
+    lower1 = np.zeros_like(b)
+    lower2 = np.zeros_like(b)
+
+    for i in range(n):
+        d = main[i].copy()
+        if i >= 1:
+            d -= lower1[i - 1] ** 2 * diagonal[i - 1]
+        if i >= 2:
+            d -= lower2[i - 2] ** 2 * diagonal[i - 2]
+        diagonal[i] = d
+        if i < n - 1:
+            e = first[i] - (lower2[i - 1] * lower1[i - 1] * diagonal[i - 1] if i >= 1 else 0)
+            lower1[i] = e / d
+        if i < n - 2:
+            lower2[i] = second[i] / d
+
+    z = np.array(b, dtype=np.float64)
+    for i in range(1, n):
+        z[i] -= lower1[i - 1] * z[i - 1]
+        if i >= 2:
+            z[i] -= lower2[i - 2] * z[i - 2]
+    z /= diagonal
+    for i in range(n - 2, -1, -1):
+        z[i] -= lower1[i] * z[i + 1]
+        if i + 2 < n:
+            z[i] -= lower2[i] * z[i + 2]
+    return z
+
+
+def als_baseline(x, Y, lam=1e5, p=0.01):
+    # Minimos quadrados assimetricos (Eilers): (W + lam D'D) z = W y, resolvido para todos os espectros juntos
+    # Pontos NaN tem peso zero: a linha de base atravessa as lacunas so pela penalidade de suavidade
+    Y = np.asarray(Y, dtype=np.float64)
+    finite = ~np.isnan(Y)
+    lowest = np.where(finite, Y, np.inf).min(axis=0, initial=np.inf)
+    if Y.shape[0] < 3:
+        return Y - lowest
+
+    # Com menos de 3 pontos finitos o sistema e singular: esses espectros so descem ao minimo
+    solvable = finite.sum(axis=0) >= 3
+    mask = np.where(solvable, finite, True)
+    values = np.where(finite, Y, 0)
+
+    main, first, second = second_difference_bands(Y.shape[0])
+    main, first, second = float(lam) * main, float(lam) * first, float(lam) * second
+
+    weights = mask.astype(np.float64)
+    for _ in range(ALS_ITERATIONS):
+        baseline = solve_pentadiagonal(main[:, np.newaxis] + weights, first, second, weights * values)
+        weights = np.where(values > baseline, float(p), 1 - float(p)) * mask
+
+    return np.where(solvable, Y - baseline, Y - lowest)
+
+
+def remove_baseline(x, Y, method='poly', **options):
+    if method == 'poly':
+        return poly_baseline(x, Y, **options)
+    if method == 'als':
+        return als_baseline(x, Y, **options)
+    raise ValueError(f'Unknown baseline method {method!r}, expected one of {BASELINE_METHODS}')
+
+
+def normalize(x, Y, method='max'):
+    # Cada espectro dividido pelo maximo, pela area ou pela norma euclidiana
+    Y = np.asarray(Y, dtype=np.float64)
+    if method == 'max':
+        scale = np.nanmax(np.abs(Y), axis=0)
+    elif method == 'area':
+        scale = np.abs(trapezoid(x, np.nan_to_num(Y)))
+    elif method == 'vector':
+        scale = np.sqrt(np.nansum(Y ** 2, axis=0))
+    else:
+        raise ValueError(f'Unknown normalization {method!r}, expected one of {NORMALIZATIONS}')
+    return Y / np.where(scale > 0, scale, 1)
+
+
+FUNCTIONS = dict(spikes=remove_spikes, smooth=savgol, baseline=remove_baseline, normalize=normalize)
+
+
+def apply_stage(function, x, Y, options):
+    # As etapas sao independentes por espectro: blocos de colunas dentro do orcamento de memoria
+    # (matriz mapeada do disco: o resultado tambem vai para um armazenamento em disco)
+    return map_to_store(lambda block: function(x, block, **options), Y)
+
+
+class PreprocessingPipeline:
+
+    # steps: {etapa: opcoes} com as etapas ativas; o resultado de cada etapa fica em cache,
+    # indexado pela matriz de origem e pelas opcoes dela e de todas as anteriores
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def run(self, dataset, steps):
+        steps = {stage: options for stage, options in (steps or {}).items() if options is not None}
+        unknown = set(steps) - set(STAGES)
+        if unknown:
+            raise ValueError(f'Unknown preprocessing stages {sorted(unknown)}, expected {STAGES}')
+        if not steps or dataset is None:
+            return dataset
+
+        with self._lock:
+            Y = dataset.intensity
+            key = (id(dataset.intensity), dataset.intensity.shape)
+
+            for stage in STAGES:
+                if stage not in steps:
+                    continue
+                key = key + ((stage, tuple(sorted(steps[stage].items()))),)
+
+                entry = self._cache.get(stage)
+                if entry is not None and entry[0] == key:
+                    Y = entry[2]
+                    continue
+
+                Y = apply_stage(FUNCTIONS[stage], dataset.x, Y, steps[stage])
+                # A matriz de origem fica referenciada para que seu id nao seja reutilizado
+                self._cache[stage] = (key, dataset.intensity, Y)
+
+        return Dataset.from_arrays(dataset.x, Y, dataset.tags, dataset.order)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,196 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# PYMAGPL_PROFILE=1 liga a medicao desde o inicio; =time mede so o tempo (sem tracemalloc)
+PROFILE_ENV = os.environ.get('PYMAGPL_PROFILE', '0')
+
+# Numero maximo de eventos guardados (os mais antigos sao descartados)
+MAX_EVENTS = 10000
+
+
+class Profiler:
+
+    # Eventos de tempo de parede, pico de memoria (tracemalloc) e tamanho dos arrays
+    def __init__(self, enabled=False, memory=True, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.memory = False
+        self.max_events = max_events
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # Thread cujas secoes medem memoria no momento (o pico do tracemalloc e do processo inteiro)
+        self.memory_owner = None
+        self.origin = time.perf_counter()
+        if enabled:
+            self.enable(memory)
+
+    def enable(self, memory=True):
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.memory_owner = None
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+
+    def reset(self):
+        with self.lock:
+            self.events = []
+
+    def stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    @contextmanager
+    def section(self, name, **sizes):
+        if not self.enabled:
+            yield sizes
+            return
+
+        stack = self.stack()
+        entry = dict(start_memory=0, peak=0, measure=False)
+
+        if self.memory:
+            # reset_peak vale para o processo todo: so um thread por vez mede memoria (o primeiro a abrir
+            # uma secao externa); secoes simultaneas de outros threads (parse_file) ficam sem pico.
+            # O pico medido inclui o que os outros threads alocaram no mesmo intervalo
+            ident = threading.get_ident()
+            with self.lock:
+                if self.memory_owner is None and not stack:
+                    self.memory_owner = ident
+                entry['measure'] = self.memory_owner == ident
+
+        if entry['measure']:
+            # O pai herda o maior pico das secoes internas
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            entry.update(start_memory=current, peak=current)
+
+        stack.append(entry)
+        start = time.perf_counter()
+        try:
+            # O chamador pode completar sizes dentro do bloco
+            yield sizes
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+
+            peak_memory = None
+            if entry['measure'] and tracemalloc.is_tracing():
+                entry['peak'] = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+                peak_memory = entry['peak'] - entry['start_memory']
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], entry['peak'])
+            if entry['measure'] and not stack:
+                with self.lock:
+                    self.memory_owner = None
+
+            self.record(name, start, duration, peak_memory, sizes, len(stack))
+
+    def record(self, name, start, duration, peak_memory, sizes, depth):
+        event = dict(
+            name=name,
+            start=start - self.origin,
+            duration=duration,
+            peak_memory=peak_memory,
+            sizes={key: array_size(value) for key, value in sizes.items()},
+            thread=threading.current_thread().name,
+            depth=depth,
+        )
+        with self.lock:
+            self.events.append(event)
+            if len(self.events) > self.max_events:
+                del self.events[:len(self.events) - self.max_events]
+
+    def summary(self):
+        # Agregado por nome: chamadas, tempo total/medio/maximo e maior pico de memoria
+        totals = {}
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            total = totals.setdefault(event['name'], dict(calls=0, total=0.0, max=0.0, peak_memory=None, sizes={}))
+            total['calls'] += 1
+            total['total'] += event['duration']
+            total['max'] = max(total['max'], event['duration'])
+            if event['peak_memory'] is not None:
+                total['peak_memory'] = max(total['peak_memory'] or 0, event['peak_memory'])
+            total['sizes'] = event['sizes'] or total['sizes']
+        for total in totals.values():
+            total['mean'] = total['total'] / total['calls']
+        return dict(sorted(totals.items(), key=lambda item: item[1]['total'], reverse=True))
+
+    def trace_events(self):
+        # Formato "Trace Event" (chrome://tracing, Perfetto, speedscope): eventos completos "X" em us
+        threads = {}
+        events = []
+        with self.lock:
+            recorded = list(self.events)
+        for event in recorded:
+            tid = threads.setdefault(event['thread'], len(threads) + 1)
+            args = dict(event['sizes'])
+            if event['peak_memory'] is not None:
+                args['peak_memory_bytes'] = event['peak_memory']
+            events.append(dict(
+                name=event['name'], ph='X', pid=os.getpid(), tid=tid,
+                ts=event['start'] * 1e6, dur=event['duration'] * 1e6, args=args,
+            ))
+        for name, tid in threads.items():
+            events.append(dict(name='thread_name', ph='M', pid=os.getpid(), tid=tid, args=dict(name=name)))
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.trace_events(), file)
+        return path
+
+
+def array_size(value):
+    # Arrays viram o shape; o resto e gravado como esta
+    shape = getattr(value, 'shape', None)
+    if shape is not None:
+        return list(shape)
+    return value
+
+
+def dataset_sizes(owner):
+    # Tamanho do dataset do App (ou do SessionPlotter) no momento da chamada
+    dataset = getattr(owner, 'dataset', None)
+    if dataset is None:
+        return {}
+    return dict(points=dataset.n_points, spectra=dataset.n_spectra)
+
+
+default_profiler = Profiler(enabled=PROFILE_ENV != '0', memory=PROFILE_ENV != 'time')
+
+
+def section(name, **sizes):
+    return default_profiler.section(name, **sizes)
+
+
+def profiled(name=None):
+    # Decorador para os metodos do App: mede a chamada e anota o tamanho do dataset
+    def decorator(function):
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            if not default_profiler.enabled:
+                return function(self, *args, **kwargs)
+            with default_profiler.section(label, **dataset_sizes(self)):
+                return function(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,142 @@
+import numpy as np
+from .out_of_core import TEMPORARY_COPIES, column_blocks, get_budget, is_mapped
+
+# Tolerancia relativa para considerar um eixo uniformemente espacado
+UNIFORM_RTOL = 1e-3
+
+
+def is_uniform(axis, rtol=UNIFORM_RTOL):
+    if axis.size < 3:
+        return True
+    steps = np.diff(axis)
+    return bool(np.all(steps > 0) and np.ptp(steps) <= rtol * abs(steps.mean()))
+
+
+def is_increasing(axis):
+    return bool(axis.size < 2 or np.all(np.diff(axis) > 0))
+
+
+def render_mode(x, y):
+    # 'image': imshow com extent, 'nonuniform': NonUniformImage, 'mesh': pcolormesh
+    if is_uniform(x) and is_uniform(y):
+        return 'image'
+    if is_increasing(x) and is_increasing(y):
+        return 'nonuniform'
+    return 'mesh'
+
+
+def image_extent(x, y, x_factor=1, y_factor=1):
+    # Bordas dos pixels: meio passo antes do primeiro ponto; com downsample cada pixel cobre `factor`
+    # pontos a partir do inicio do seu bloco, e o ultimo bloco incompleto ocupa um pixel inteiro
+    # (assim todos os blocos ficam no lugar certo, em vez de esticar a imagem ate o ultimo ponto)
+    def edges(axis, factor):
+        if axis.size < 2:
+            return axis[0] - 0.5, axis[0] + 0.5
+        step = (axis[-1] - axis[0]) / (axis.size - 1)
+        low = axis[0] - step / 2
+        blocks = -(-axis.size // factor)
+        return low, low + blocks * factor * step
+
+    return (*edges(x, x_factor), *edges(y, y_factor))
+
+
+def block_factor(size, max_size):
+    # Pontos por bloco para que size pontos caibam em max_size pixels
+    return max(int(np.ceil(size / max(int(max_size), 1))), 1)
+
+
+def block_starts(size, max_size):
+    return np.arange(0, size, block_factor(size, max_size))
+
+
+def reduce_axis(axis, starts):
+    counts = np.diff(np.append(starts, axis.size))
+    return np.add.reduceat(axis, starts) / counts
+
+
+def downsample(x, y, z, max_cols, max_rows, budget=None):
+    # Reduz z (ny, nx) para no maximo max_rows x max_cols pixels, preservando os picos (maximo por bloco)
+    cols = block_starts(z.shape[1], max_cols)
+    rows = block_starts(z.shape[0], max_rows)
+    reduce_cols = cols.size < z.shape[1]
+    reduce_rows = rows.size < z.shape[0]
+
+    if not reduce_cols and not reduce_rows:
+        return x, y, z
+
+    budget = get_budget(budget)
+    if is_mapped(z) or z.nbytes * TEMPORARY_COPIES > budget:
+        # Matriz grande ou mapeada do disco: grupos de linhas inteiras de pixels por vez
+        factor = int(rows[1] - rows[0]) if rows.size > 1 else z.shape[0]
+        per_pixel_row = factor * z.shape[1] * 8 * 2
+        step = max(1, int(budget // per_pixel_row)) if reduce_rows else max(1, int(budget // (z.shape[1] * 16)))
+        starts = rows if reduce_rows else np.arange(z.shape[0])
+
+        parts = []
+        for first in range(0, starts.size, step):
+            begin = starts[first]
+            end = starts[first + step] if first + step < starts.size else z.shape[0]
+            part = np.asarray(z[begin:end], dtype=np.float64)
+            if reduce_cols:
+                part = np.fmax.reduceat(part, cols, axis=1)
+            if reduce_rows:
+                part = np.fmax.reduceat(part, starts[first:first + step] - begin, axis=0)
+            parts.append(part)
+        z = np.concatenate(parts)
+    else:
+        if reduce_cols:
+            z = np.fmax.reduceat(z, cols, axis=1)
+        if reduce_rows:
+            z = np.fmax.reduceat(z, rows, axis=0)
+
+    if reduce_cols:
+        x = reduce_axis(x, cols)
+    if reduce_rows:
+        y = reduce_axis(y, rows)
+
+    return x, y, z
+
+
+def axes_pixel_size(ax):
+    bbox = ax.get_window_extent()
+    return max(int(bbox.width), 1), max(int(bbox.height), 1)
+
+
+def minmax_decimate(x, Y, n_bins, budget=None):
+    # Espectros em blocos de colunas quando a matriz nao cabe no orcamento (ou esta mapeada do disco)
+    if is_mapped(Y) or Y.nbytes * TEMPORARY_COPIES > get_budget(budget):
+        parts = [decimate_block(x, np.asarray(Y[:, block], dtype=np.float64), n_bins)
+                 for block in column_blocks(Y.shape[0], Y.shape[1], budget)]
+        return (np.concatenate([np.broadcast_to(xs, ys.shape) for xs, ys in parts], axis=1),
+                np.concatenate([ys for _, ys in parts], axis=1))
+    return decimate_block(x, Y, n_bins)
+
+
+def decimate_block(x, Y, n_bins):
+    # Reduz cada espectro (colunas de Y) a um par min/max por bin, na ordem original, para nao perder picos
+    n_points, n_spectra = Y.shape
+    if n_points <= 2 * n_bins:
+        return np.broadcast_to(x[:, np.newaxis], Y.shape), Y
+
+    factor = int(np.ceil(n_points / n_bins))
+    n_blocks = int(np.ceil(n_points / factor))
+    pad = n_blocks * factor - n_points
+
+    # Completa o ultimo bin repetindo o ultimo ponto
+    padded = Y if pad == 0 else np.concatenate([Y, np.repeat(Y[-1:], pad, axis=0)])
+    blocks = padded.reshape(n_blocks, factor, n_spectra)
+
+    if np.isnan(Y).any():
+        low = np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=1)
+        high = np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=1)
+    else:
+        low = np.argmin(blocks, axis=1)
+        high = np.argmax(blocks, axis=1)
+
+    base = (np.arange(n_blocks) * factor)[:, np.newaxis]
+    index = np.empty((2 * n_blocks, n_spectra), dtype=np.intp)
+    index[0::2] = base + np.minimum(low, high)
+    index[1::2] = base + np.maximum(low, high)
+    np.minimum(index, n_points - 1, out=index)
+
+    return x[index], Y[index, np.arange(n_spectra)]
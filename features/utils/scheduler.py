@@ -0,0 +1,128 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Intervalo de consulta das tarefas pelo mainloop (ms)
+POLL_MS = 30
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+
+    # Passado para o trabalho em segundo plano: cancelamento cooperativo e mensagens de progresso
+    __slots__ = ('key', 'future', 'on_done', 'on_error', 'on_progress', 'messages', '_cancelled')
+
+    def __init__(self, key, on_done=None, on_error=None, on_progress=None):
+        self.key = key
+        self.future = None
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.messages = queue.Queue()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            # Tarefas ainda na fila nem chegam a rodar
+            self.future.cancel()
+
+    def check(self):
+        # Chamado pelo trabalho entre etapas: interrompe uma tarefa substituida por outra mais nova
+        if self.cancelled:
+            raise TaskCancelled(self.key)
+
+    def progress(self, *args):
+        self.messages.put(args)
+
+
+class TaskScheduler:
+
+    # Roda o processamento fora do thread do Tk; so os callbacks (artistas, widgets)
+    # voltam para o mainloop, agendados por after()
+    def __init__(self, after, workers=1, poll_ms=POLL_MS, on_busy=None):
+        self.after = after
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pymagpl-task')
+        self.tasks = {}
+        self.polling = False
+
+    @property
+    def busy(self):
+        return bool(self.tasks)
+
+    def submit(self, key, work, on_done=None, on_error=None, on_progress=None):
+        # Uma tarefa por chave: um novo clique cancela a tarefa anterior da mesma chave
+        self.cancel(key)
+
+        task = Task(key, on_done, on_error, on_progress)
+        task.future = self.pool.submit(work, task)
+        self.tasks[key] = task
+
+        self.notify()
+        if not self.polling:
+            self.polling = True
+            self.after(self.poll_ms, self.poll)
+
+        return task
+
+    def cancel(self, *keys):
+        cancelled = [self.tasks.pop(key) for key in keys if key in self.tasks]
+        for task in cancelled:
+            task.cancel()
+        if cancelled:
+            self.notify()
+
+    def cancel_all(self):
+        self.cancel(*list(self.tasks))
+
+    def notify(self):
+        if self.on_busy is not None:
+            self.on_busy(tuple(self.tasks))
+
+    def poll(self):
+        try:
+            self.dispatch()
+        finally:
+            # Um erro em um callback nao pode interromper a consulta das demais tarefas
+            if self.tasks:
+                self.after(self.poll_ms, self.poll)
+            else:
+                self.polling = False
+
+    def dispatch(self):
+        for key, task in list(self.tasks.items()):
+            while task.on_progress is not None:
+                try:
+                    args = task.messages.get_nowait()
+                except queue.Empty:
+                    break
+                task.on_progress(*args)
+
+            if not task.future.done() or self.tasks.get(key) is not task:
+                continue
+
+            del self.tasks[key]
+            self.notify()
+
+            error = task.future.exception()
+            if isinstance(error, TaskCancelled):
+                continue
+            if error is not None:
+                if task.on_error is None:
+                    raise error
+                task.on_error(error)
+            elif task.on_done is not None:
+                task.on_done(task.future.result())
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.shutdown(wait=False, cancel_futures=True)
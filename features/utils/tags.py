@@ -0,0 +1,113 @@
+import os
+import re
+import numpy as np
+
+# Fracao do passo tolerada ao decidir se o valor final cabe no intervalo (erro de ponto flutuante)
+STEP_TOLERANCE = 1e-6
+
+# Campos do SPE usados como variavel customizada: tempo de inicio da exposicao ou indice do frame
+SPE_FIELDS = ('time', 'frame')
+
+FIELD_SEPARATORS = re.compile(r'[,;\s]+')
+
+
+def interval_size(init, final, step):
+    # Numero exato de valores de init ate final (inclusive) com o passo dado
+    init, final, step = float(init), float(final), float(step)
+    if not np.isfinite([init, final, step]).all():
+        raise ValueError(f'Invalid custom variable interval {init:g}:{final:g}:{step:g}')
+    if init == final:
+        return 1
+    if step == 0 or (final - init) * step < 0:
+        raise ValueError(f'Step {step:g} cannot go from {init:g} to {final:g}')
+    return int(np.floor((final - init) / step + STEP_TOLERANCE)) + 1
+
+
+def interval_values(init, final, step):
+    # Os valores sao init + k * step calculados direto, sem acumular o passo como o np.arange
+    count = interval_size(init, final, step)
+    return np.linspace(float(init), float(init) + float(step) * (count - 1), count)
+
+
+def build_tags(intervals, count=None):
+    # Cada intervalo (inicial, final, passo) gera uma sequencia de valores da variavel customizada
+    intervals = list(intervals)
+    if not intervals:
+        return None
+
+    tags = np.concatenate([interval_values(*interval) for interval in intervals])
+    return check_tags(tags, count)
+
+
+def check_tags(tags, count=None):
+    # Um valor finito por espectro; count=None so valida os valores
+    tags = np.asarray(tags, dtype=np.float64).ravel()
+    if count is not None and tags.size != count:
+        raise ValueError(f'{tags.size} custom variable values given for {count} spectra')
+    if not np.isfinite(tags).all():
+        raise ValueError('The custom variable values must be finite numbers')
+    return tags
+
+
+def read_tags_file(path, column=-1):
+    # Um valor por linha (ou uma coluna de uma tabela); cabecalhos e comentarios sao ignorados
+    values = []
+    with open(path, 'r', errors='ignore') as file:
+        for line in file:
+            fields = FIELD_SEPARATORS.split(line.strip())
+            if not fields[0] or line.lstrip().startswith('#'):
+                continue
+            try:
+                values.append(float(fields[column]))
+            except (ValueError, IndexError):
+                continue
+
+    if not values:
+        raise ValueError(f'No custom variable values found in {os.path.basename(path)}')
+    return np.asarray(values, dtype=np.float64)
+
+
+def spe_tags(paths, field='time', rows=None, binning=None):
+    # Valor por espectro a partir dos metadados SPE; com binning parcial cada frame gera varios espectros
+    from .SPE_Loader import read_spe
+
+    tags = []
+    for path in paths:
+        reader = read_spe(path)
+        header = reader.getHeader()
+        metadata = reader.getFrameMetadata()
+
+        if field == 'frame':
+            values = metadata.get('FrameTrackingNumber', np.arange(1, header.Frame + 1, dtype=np.float64))
+        elif field == 'time':
+            if 'ExposureStarted' in metadata:
+                values = metadata['ExposureStarted']
+            else:
+                # SPE 2.x: sem timestamps, tempo nominal pelo tempo de exposicao
+                values = np.arange(header.Frame, dtype=np.float64) * header.ExpTime
+        elif field in metadata:
+            values = metadata[field]
+        else:
+            raise ValueError(f'{os.path.basename(path)} has no per-frame {field!r} metadata')
+
+        per_frame = reader.getBinned(rows, binning, slice(0, 1)).shape[0]
+        tags.append(np.repeat(values, per_frame))
+
+    return check_tags(np.concatenate(tags))
+
+
+def load_tags(path, field='time', rows=None, binning=None):
+    if os.path.splitext(path)[1].lower() == '.spe':
+        return spe_tags([path], field, rows, binning)
+    return read_tags_file(path)
+
+
+def sort_order(tags):
+    # Permutacao que ordena os espectros pela variavel customizada; None se ja sao monotonicos
+    # (uma varredura decrescente e desenhada invertendo a view, sem copia)
+    if tags is None or tags.size < 2:
+        return None
+    steps = np.diff(tags)
+    if np.all(steps >= 0) or np.all(steps <= 0):
+        return None
+    return np.argsort(tags, kind='stable')
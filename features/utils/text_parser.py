@@ -0,0 +1,96 @@
+import numpy as np
+from .formats import HAS_PYARROW
+
+# Separadores oferecidos na interface -> separador do pandas
+SEPARATORS = {'Tab/space': r'\s+', ',': ',', ';': ';'}
+
+COMMENT_CHARS = ('#', '%', '!', '//')
+
+SAMPLE_BYTES = 64 * 1024
+
+
+def split_fields(line, sep):
+    if sep == r'\s+':
+        return line.split()
+    return [field.strip() for field in line.split(sep)]
+
+
+def is_numeric_row(fields, decimal):
+    if len(fields) < 2:
+        return False
+    try:
+        for field in fields:
+            float(field.replace(decimal, '.') if decimal != '.' else field)
+    except ValueError:
+        return False
+    return True
+
+
+def sniff_format(filepath):
+    # Descobre separador, decimal, linhas de cabecalho e comentarios a partir de uma amostra do arquivo
+    with open(filepath, 'r', errors='ignore') as file:
+        sample = file.read(SAMPLE_BYTES)
+
+    lines = sample.splitlines()
+    if len(sample) == SAMPLE_BYTES and len(lines) > 1:
+        # A ultima linha da amostra pode estar cortada
+        lines = lines[:-1]
+
+    has_comments = any(line.lstrip().startswith(COMMENT_CHARS) for line in lines)
+    data_lines = [(index, line) for index, line in enumerate(lines)
+                  if line.strip() and not line.lstrip().startswith(COMMENT_CHARS)]
+
+    best = None
+    for sep, decimal in (('\t', '.'), (',', '.'), (';', '.'), (';', ','), (r'\s+', '.'), ('\t', ',')):
+        numeric = [(index, len(fields)) for index, line in data_lines
+                   for fields in [split_fields(line, sep)] if is_numeric_row(fields, decimal)]
+        if not numeric:
+            continue
+
+        # Numero de colunas mais comum entre as linhas numericas
+        widths = [width for _, width in numeric]
+        ncols = max(set(widths), key=widths.count)
+        rows = [index for index, width in numeric if width == ncols]
+
+        score = (len(rows), ncols)
+        if best is None or score > best[0]:
+            best = (score, sep, decimal, rows[0])
+
+    if best is None:
+        raise ValueError(f'No numeric columns found in {filepath}')
+
+    _, sep, decimal, first_row = best
+
+    return sep, decimal, first_row, has_comments
+
+
+def parse_text(filepath, sep='Auto'):
+    # Le um arquivo de texto com colunas numericas e devolve uma matriz float64 sem linhas invalidas
+    import pandas as pd
+
+    if sep == 'Auto':
+        sep, decimal, skiprows, has_comments = sniff_format(filepath)
+    else:
+        sep, decimal, skiprows, has_comments = SEPARATORS.get(sep, sep), '.', 0, True
+
+    options = dict(sep=sep, header=None, skiprows=skiprows, decimal=decimal)
+    comment = '#' if has_comments else None
+
+    try:
+        if HAS_PYARROW and not has_comments and decimal == '.' and len(sep) == 1:
+            df = pd.read_csv(filepath, engine='pyarrow', dtype=np.float64, **options)
+        else:
+            df = pd.read_csv(filepath, engine='c', dtype=np.float64, comment=comment, **options)
+        data = df.to_numpy()
+    except (ValueError, TypeError):
+        # Ha linhas nao numericas no meio do arquivo: le como texto e converte coluna a coluna
+        df = pd.read_csv(filepath, engine='c', dtype=str, comment=comment, on_bad_lines='skip', **options)
+        if decimal != '.':
+            df = df.apply(lambda column: column.str.replace(decimal, '.', regex=False))
+        data = np.column_stack([
+            pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+            for column in df.columns
+        ])
+
+    # Remove as linhas com qualquer valor nao numerico de uma vez
+    return data[np.isfinite(data).all(axis=1)]